@@ -1,9 +1,10 @@
 import enum
 import uuid
 from datetime import datetime, UTC
+from functools import lru_cache
 from database_api.planexe_db_singleton import db
 from sqlalchemy_utils import UUIDType
-from sqlalchemy import JSON
+from sqlalchemy import JSON, Row, Update, or_, select, update
 
 class TaskState(enum.Enum):
     pending = 1
@@ -61,6 +62,25 @@ class TaskItem(db.Model):
     def __repr__(self):
         return f"{self.id}: {self.timestamp_created}, {self.state}, {self.prompt!r}, parameters: {self.parameters!r}"
 
+    @classmethod
+    def claim_pending_batch(cls, limit: int = 1, skip_locked: bool = True) -> list[Row]:
+        """
+        Claim up to `limit` of the oldest pending tasks that have no stop request, in a single UPDATE ... RETURNING.
+
+        The claimed rows are set to processing. With skip_locked, rows locked by another worker's claim are skipped
+        (FOR UPDATE SKIP LOCKED; SQLAlchemy leaves that clause out on SQLite, which has no row locks).
+        Without it, the statement takes no explicit locks, which suits distributed SQL databases where SKIP LOCKED
+        is slow or unreliable. There, the outer state check makes the claim atomic: when two workers race for the same row,
+        only one UPDATE matches it, and the other claims nothing (or gets a serialization error) and tries again later.
+        Returns (id, prompt, parameters, user_id, timestamp_created) rows, oldest first.
+        The caller commits.
+        """
+        rows = db.session.execute(_claim_pending_statement(limit, skip_locked)).all()
+        # RETURNING doesn't preserve the subquery's ORDER BY. NULL timestamps sort first, and are never
+        # compared against datetimes, so naive and tz-aware drivers both work.
+        rows.sort(key=lambda row: (row.timestamp_created is not None, row.timestamp_created))
+        return rows
+
     def has_parameter_key(self, key: str) -> bool:
         if not isinstance(self.parameters, dict):
             return False
@@ -95,3 +115,29 @@ class TaskItem(db.Model):
             }
         )
         return [task1, task2, task3]
+
+
+@lru_cache(maxsize=16)
+def _claim_pending_statement(limit: int, skip_locked: bool) -> Update:
+    """
+    The UPDATE used by TaskItem.claim_pending_batch, built once per (limit, skip_locked).
+    Reusing the same statement object skips rebuilding the expression tree on every poll, and SQLAlchemy
+    memoizes its cache key, so each execute goes straight to the already compiled SQL.
+    """
+    claimable_ids = (
+        select(TaskItem.id)
+        .where(TaskItem.state == TaskState.pending)
+        .where(or_(TaskItem.stop_requested.is_(False), TaskItem.stop_requested.is_(None)))
+        .order_by(TaskItem.timestamp_created.asc())
+        .limit(limit)
+    )
+    if skip_locked:
+        claimable_ids = claimable_ids.with_for_update(skip_locked=True)
+    return (
+        update(TaskItem)
+        .where(TaskItem.id.in_(claimable_ids))
+        .where(TaskItem.state == TaskState.pending)
+        .values(state=TaskState.processing, progress_message="Picked up by server", progress_percentage=0.0)
+        .returning(TaskItem.id, TaskItem.prompt, TaskItem.parameters, TaskItem.user_id, TaskItem.timestamp_created)
+        .execution_options(synchronize_session=False)
+    )
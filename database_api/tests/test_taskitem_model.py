@@ -1,6 +1,8 @@
 import unittest
+from datetime import datetime, timedelta
 
 from flask import Flask
+from sqlalchemy import update
 
 from database_api.planexe_db_singleton import db
 from database_api.model_taskitem import TaskItem, TaskState
@@ -35,3 +37,60 @@ class TestTaskItemModel(unittest.TestCase):
             self.assertTrue(hasattr(fetched, "stop_requested"))
             self.assertTrue(hasattr(fetched, "stop_requested_timestamp"))
             self.assertFalse(bool(fetched.stop_requested))
+
+    def test_claim_pending_batch_claims_oldest_claimable_tasks(self):
+        with self.app.app_context():
+            now = datetime(2026, 1, 1, 12, 0, 0)
+            newest = TaskItem(state=TaskState.pending, prompt="newest", user_id="u", timestamp_created=now)
+            oldest = TaskItem(state=TaskState.pending, prompt="oldest", user_id="u", timestamp_created=now - timedelta(minutes=2))
+            middle = TaskItem(state=TaskState.pending, prompt="middle", user_id="u", timestamp_created=now - timedelta(minutes=1))
+            stopped = TaskItem(state=TaskState.pending, prompt="stopped", user_id="u", stop_requested=True, timestamp_created=now - timedelta(minutes=3))
+            done = TaskItem(state=TaskState.completed, prompt="done", user_id="u", timestamp_created=now - timedelta(minutes=4))
+            db.session.add_all([newest, oldest, middle, stopped, done])
+            db.session.commit()
+
+            rows = TaskItem.claim_pending_batch(limit=2)
+            db.session.commit()
+
+            self.assertEqual([row.prompt for row in rows], ["oldest", "middle"])
+            self.assertEqual(rows[0].id, oldest.id)
+            db.session.expire_all()
+            self.assertEqual(db.session.get(TaskItem, oldest.id).state, TaskState.processing)
+            self.assertEqual(db.session.get(TaskItem, oldest.id).progress_message, "Picked up by server")
+            self.assertEqual(db.session.get(TaskItem, middle.id).state, TaskState.processing)
+            self.assertEqual(db.session.get(TaskItem, newest.id).state, TaskState.pending)
+            self.assertEqual(db.session.get(TaskItem, stopped.id).state, TaskState.pending)
+
+            self.assertEqual([row.prompt for row in TaskItem.claim_pending_batch(limit=5)], ["newest"])
+            self.assertEqual(TaskItem.claim_pending_batch(limit=5), [])
+
+    def test_claim_pending_batch_without_skip_locked(self):
+        with self.app.app_context():
+            task = TaskItem(state=TaskState.pending, prompt="only", user_id="u")
+            db.session.add(task)
+            db.session.commit()
+
+            rows = TaskItem.claim_pending_batch(limit=1, skip_locked=False)
+            db.session.commit()
+
+            self.assertEqual([row.id for row in rows], [task.id])
+            self.assertEqual(TaskItem.claim_pending_batch(limit=1, skip_locked=False), [])
+
+    def test_claim_pending_batch_puts_null_timestamps_first(self):
+        with self.app.app_context():
+            dated = TaskItem(state=TaskState.pending, prompt="dated", user_id="u", timestamp_created=datetime(2026, 1, 1, 12, 0, 0))
+            undated1 = TaskItem(state=TaskState.pending, prompt="undated1", user_id="u")
+            undated2 = TaskItem(state=TaskState.pending, prompt="undated2", user_id="u")
+            db.session.add_all([dated, undated1, undated2])
+            db.session.commit()
+            # The column default fills in timestamp_created on insert, so clear it afterwards.
+            db.session.execute(
+                update(TaskItem).where(TaskItem.id.in_([undated1.id, undated2.id])).values(timestamp_created=None)
+            )
+            db.session.commit()
+
+            rows = TaskItem.claim_pending_batch(limit=3)
+            db.session.commit()
+
+            self.assertEqual([row.prompt for row in rows][-1], "dated")
+            self.assertEqual({row.prompt for row in rows[:2]}, {"undated1", "undated2"})
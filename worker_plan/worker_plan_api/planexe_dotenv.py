@@ -17,6 +17,10 @@ logger = logging.getLogger(__name__)
 class DotEnvKeyEnum(str, Enum):
     PATH_TO_PYTHON = "PATH_TO_PYTHON"
     PLANEXE_RUN_DIR = "PLANEXE_RUN_DIR"
+    # worker_plan_database: "skip_locked" or "atomic_update". Unset picks by database dialect.
+    PLANEXE_TASK_CLAIM_STRATEGY = "PLANEXE_TASK_CLAIM_STRATEGY"
+    # worker_plan_database: optional memory-backed dir (e.g. /dev/shm) for FAST_BUT_SKIP_DETAILS runs.
+    PLANEXE_FAST_RUN_DIR = "PLANEXE_FAST_RUN_DIR"
 
 @dataclass
 class PlanExeDotEnv:
@@ -27,7 +27,7 @@ def set_current_task_id(task_id: Optional[str]) -> None:
     """Set the current TaskItem.id for token tracking."""
     global _current_task_id
     _current_task_id = task_id
-    logger.debug(f"Set current task_id for token tracking: {task_id}")
+    logger.debug("Set current task_id for token tracking: %s", task_id)
 
 
 def get_current_task_id() -> Optional[str]:
@@ -39,7 +39,7 @@ def set_current_user_id(user_id: Optional[str]) -> None:
     """Set the current UserAccount.id for token tracking."""
     global _current_user_id
     _current_user_id = user_id
-    logger.debug(f"Set current user_id for token tracking: {user_id}")
+    logger.debug("Set current user_id for token tracking: %s", user_id)
 
 
 def get_current_user_id() -> Optional[str]:
@@ -8,6 +8,8 @@ import logging
 from typing import Optional, List
 from datetime import datetime, UTC
 
+from sqlalchemy import insert
+
 logger = logging.getLogger(__name__)
 
 __all__ = ["TokenMetricsStore", "get_token_metrics_store"]
@@ -96,7 +98,9 @@ class TokenMetricsStore:
             return False
 
         try:
-            metric = self.TokenMetrics(
+            # A Core INSERT rather than session.add(TokenMetrics(...)). The row is never read back here,
+            # so there is no need for the unit of work, the identity map, or fetching the generated id.
+            statement = insert(self.TokenMetrics).values(
                 task_id=task_id,
                 user_id=user_id,
                 llm_model=llm_model,
@@ -111,7 +115,7 @@ class TokenMetricsStore:
                 error_message=error_message,
                 raw_usage_data=raw_usage_data,
             )
-            self.db.session.add(metric)
+            self.db.session.execute(statement)
             self.db.session.commit()
             logger.debug(
                 f"Recorded token usage: task_id={task_id}, model={llm_model}, "
@@ -1,4 +1,5 @@
 import logging
+import os
 import time
 from dataclasses import dataclass
 from datetime import datetime
@@ -17,6 +18,20 @@ logger = logging.getLogger(__name__)
 PING_LLM_PROMPT = "Reply with 'PONG' and one short sentence confirming you can answer requests."
 PING_LLM_REPORT_TITLE = "PlanExe LLM Ping"
 
+_PIPELINE_COMPLETE_CONTENT = b"LLM ping completed.\n"
+
+_ATTEMPTS_TABLE_HEAD = (
+    "<table>"
+    "<thead>"
+    "<tr><th>#</th><th>LLM</th><th>Stage</th><th>Status</th><th>Duration</th><th>Error</th></tr>"
+    "</thead>"
+    "<tbody>"
+)
+_ATTEMPTS_TABLE_TAIL = "</tbody></table>"
+_ATTEMPT_ROW_TEMPLATE = (
+    "<tr><td>{index}</td><td>{llm}</td><td>{stage}</td><td>{status}</td><td>{duration:.2f}s</td><td>{error}</td></tr>"
+)
+
 
 @dataclass
 class PingLLMResult:
@@ -26,92 +41,89 @@ class PingLLMResult:
     duration_seconds: float
     started_at: datetime
     error_message: Optional[str] = None
+    success_attempt: Optional[LLMAttempt] = None
 
 
 def _validate_run_dir(run_id_dir: Path) -> None:
-    if not run_id_dir.exists():
-        raise FileNotFoundError(f"The run_id_dir does not exist: {run_id_dir!r}")
-    if not run_id_dir.is_dir():
-        raise NotADirectoryError(f"The run_id_dir is not a directory: {run_id_dir!r}")
-    if not (run_id_dir / FilenameEnum.START_TIME.value).exists():
+    # A single directory listing replaces the separate exists/is_dir/child-exists checks.
+    try:
+        with os.scandir(run_id_dir) as entries:
+            filenames = {entry.name for entry in entries}
+    except FileNotFoundError:
+        raise FileNotFoundError(f"The run_id_dir does not exist: {run_id_dir!r}") from None
+    except NotADirectoryError:
+        raise NotADirectoryError(f"The run_id_dir is not a directory: {run_id_dir!r}") from None
+    if FilenameEnum.START_TIME.value not in filenames:
         raise FileNotFoundError(
             f"The '{FilenameEnum.START_TIME.value}' file does not exist in the run_id_dir: {run_id_dir!r}"
         )
-    if not (run_id_dir / FilenameEnum.INITIAL_PLAN.value).exists():
+    if FilenameEnum.INITIAL_PLAN.value not in filenames:
         raise FileNotFoundError(
             f"The '{FilenameEnum.INITIAL_PLAN.value}' file does not exist in the run_id_dir: {run_id_dir!r}"
         )
 
 
+# Keyed by id(llm_model). The same model instances are reused across attempts, so the description is computed once per model.
+# Cleared at the start of every run_ping_llm_report, so ids of garbage collected models from a previous run are never looked up.
+_describe_cache: dict[int, str] = {}
+
+
 def _describe_llm_model(llm_model: LLMModelBase) -> str:
+    key = id(llm_model)
+    description = _describe_cache.get(key)
+    if description is not None:
+        return description
+
     model_name = getattr(llm_model, "name", None)
     if isinstance(model_name, str) and model_name:
-        return model_name
-    inner_llm = getattr(llm_model, "llm", None)
-    if inner_llm is not None:
-        return inner_llm.__class__.__name__
-    return repr(llm_model)
+        description = model_name
+    else:
+        inner_llm = getattr(llm_model, "llm", None)
+        if inner_llm is not None:
+            description = inner_llm.__class__.__name__
+        else:
+            description = repr(llm_model)
+    _describe_cache[key] = description
+    return description
 
 
 def _build_attempts_table(attempts: list[LLMAttempt]) -> str:
     if not attempts:
         return "<p>No attempts were recorded.</p>"
 
-    rows = []
-    for index, attempt in enumerate(attempts):
-        status = "success" if attempt.success else "failed"
-        exception_text = escape(repr(attempt.exception)) if attempt.exception else ""
-        rows.append(
-            "<tr>"
-            f"<td>{index}</td>"
-            f"<td>{escape(_describe_llm_model(attempt.llm_model))}</td>"
-            f"<td>{escape(attempt.stage)}</td>"
-            f"<td>{status}</td>"
-            f"<td>{attempt.duration:.2f}s</td>"
-            f"<td>{exception_text}</td>"
-            "</tr>"
+    rows = [
+        _ATTEMPT_ROW_TEMPLATE.format(
+            index=index,
+            llm=escape(_describe_llm_model(attempt.llm_model)),
+            stage=escape(attempt.stage),
+            status="success" if attempt.success else "failed",
+            duration=attempt.duration,
+            error=escape(repr(attempt.exception)) if attempt.exception else "",
         )
-
-    rows_html = "\n".join(rows)
-    return (
-        "<table>"
-        "<thead>"
-        "<tr><th>#</th><th>LLM</th><th>Stage</th><th>Status</th><th>Duration</th><th>Error</th></tr>"
-        "</thead>"
-        f"<tbody>{rows_html}</tbody>"
-        "</table>"
-    )
+        for index, attempt in enumerate(attempts)
+    ]
+    return "".join((_ATTEMPTS_TABLE_HEAD, "\n".join(rows), _ATTEMPTS_TABLE_TAIL))
 
 
 def _build_ping_report_html(result: PingLLMResult) -> str:
-    success_attempt = next((attempt for attempt in result.attempts if attempt.success), None)
+    success_attempt = result.success_attempt
     selected_llm = _describe_llm_model(success_attempt.llm_model) if success_attempt else "None"
+    response_text = result.response_text or "(no response)"
 
-    error_section = ""
+    parts = [
+        "<p><strong>Status:</strong> ", "ok" if result.error_message is None else "failed", "</p>",
+        "<p><strong>Started:</strong> ", escape(result.started_at.isoformat()), "</p>",
+        "<p><strong>Duration:</strong> ", f"{result.duration_seconds:.2f}", " seconds</p>",
+        "<p><strong>Selected LLM:</strong> ", escape(selected_llm), "</p>",
+    ]
     if result.error_message:
-        error_section = (
-            "<h3>Error</h3>"
-            f"<pre>{escape(result.error_message)}</pre>"
-        )
-
-    response_text = result.response_text or "(no response)"
-    return (
-        "<p><strong>Status:</strong> "
-        f"{'ok' if result.error_message is None else 'failed'}</p>"
-        "<p><strong>Started:</strong> "
-        f"{escape(result.started_at.isoformat())}</p>"
-        "<p><strong>Duration:</strong> "
-        f"{result.duration_seconds:.2f} seconds</p>"
-        "<p><strong>Selected LLM:</strong> "
-        f"{escape(selected_llm)}</p>"
-        f"{error_section}"
-        "<h3>Prompt</h3>"
-        f"<pre>{escape(result.prompt)}</pre>"
-        "<h3>Response</h3>"
-        f"<pre>{escape(response_text)}</pre>"
-        "<h3>Attempts</h3>"
-        f"{_build_attempts_table(result.attempts)}"
-    )
+        parts.extend(("<h3>Error</h3><pre>", escape(result.error_message), "</pre>"))
+    parts.extend((
+        "<h3>Prompt</h3><pre>", escape(result.prompt), "</pre>",
+        "<h3>Response</h3><pre>", escape(response_text), "</pre>",
+        "<h3>Attempts</h3>", _build_attempts_table(result.attempts),
+    ))
+    return "".join(parts)
 
 
 def _write_ping_report(output_path: Path, result: PingLLMResult) -> None:
@@ -127,6 +139,7 @@ def run_ping_llm_report(
     prompt: str = PING_LLM_PROMPT,
 ) -> PingLLMResult:
     _validate_run_dir(run_id_dir)
+    _describe_cache.clear()
 
     llm_executor = LLMExecutor(llm_models=llm_models)
     started_at = datetime.now().astimezone()
@@ -144,13 +157,15 @@ def run_ping_llm_report(
         logger.error("PING_LLM execution failed: %s", exc, exc_info=True)
 
     duration_seconds = time.perf_counter() - start_time
+    attempts = llm_executor.attempts
     result = PingLLMResult(
         prompt=prompt,
         response_text=response_text,
-        attempts=llm_executor.attempts,
+        attempts=attempts,
         duration_seconds=duration_seconds,
         started_at=started_at,
         error_message=str(error) if error else None,
+        success_attempt=next((attempt for attempt in attempts if attempt.success), None),
     )
 
     report_path = run_id_dir / FilenameEnum.REPORT.value
@@ -158,7 +173,11 @@ def run_ping_llm_report(
 
     if error is None:
         pipeline_complete_path = run_id_dir / FilenameEnum.PIPELINE_COMPLETE.value
-        pipeline_complete_path.write_text("LLM ping completed.\n", encoding="utf-8")
+        fd = os.open(pipeline_complete_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.write(fd, _PIPELINE_COMPLETE_CONTENT)
+        finally:
+            os.close(fd)
 
     if error is not None:
         raise error
@@ -26,6 +26,7 @@ class TestPingLLMReport(unittest.TestCase):
             self.assertEqual(len(result.attempts), 2)
             self.assertFalse(result.attempts[0].success)
             self.assertTrue(result.attempts[1].success)
+            self.assertIs(result.success_attempt, result.attempts[1])
 
             report_path = run_id_dir / FilenameEnum.REPORT.value
             self.assertTrue(report_path.exists())
@@ -34,6 +35,24 @@ class TestPingLLMReport(unittest.TestCase):
 
             pipeline_complete_path = run_id_dir / FilenameEnum.PIPELINE_COMPLETE.value
             self.assertTrue(pipeline_complete_path.exists())
+            self.assertEqual(pipeline_complete_path.read_text(encoding="utf-8"), "LLM ping completed.\n")
+
+    def test_ping_llm_report_validates_run_dir(self):
+        llm_models = LLMModelWithInstance.from_instances([ResponseMockLLM(responses=["PONG ok"])])
+        with TemporaryDirectory() as temp_dir:
+            run_id_dir = Path(temp_dir)
+            with self.assertRaises(FileNotFoundError):
+                run_ping_llm_report(run_id_dir=run_id_dir / "missing", llm_models=llm_models)
+
+            not_a_dir = run_id_dir / "file.txt"
+            not_a_dir.write_text("x", encoding="utf-8")
+            with self.assertRaises(NotADirectoryError):
+                run_ping_llm_report(run_id_dir=not_a_dir, llm_models=llm_models)
+
+            (run_id_dir / FilenameEnum.START_TIME.value).write_text("{}", encoding="utf-8")
+            with self.assertRaises(FileNotFoundError):
+                run_ping_llm_report(run_id_dir=run_id_dir, llm_models=llm_models)
+            self.assertFalse((run_id_dir / FilenameEnum.REPORT.value).exists())
 
 
 if __name__ == "__main__":
@@ -1,18 +1,28 @@
-import datetime
 import logging
 import os
 import shutil
 import threading
 import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import lru_cache
 
 logger = logging.getLogger(__name__)
 
 _START_TIME_SUFFIX = "start_time.json"
 _PLAN_SUFFIX = "plan.txt"
 
+# Deleting a run dir is syscall bound and independent of the other run dirs, so a few can be deleted in parallel.
+_DELETE_MAX_WORKERS = min(8, os.cpu_count() or 4)
 
+
+@lru_cache(maxsize=4096)
 def _is_uuid_name(name: str) -> bool:
+    # Canonical UUID strings are 36 chars with dashes at fixed positions.
+    # Reject other names up front, since the ValueError path in uuid.UUID() is the slow one.
+    if len(name) != 36 or name[8] != "-" or name[13] != "-" or name[18] != "-" or name[23] != "-":
+        return False
     try:
         parsed = uuid.UUID(name)
     except ValueError:
@@ -20,24 +30,48 @@ def _is_uuid_name(name: str) -> bool:
     return str(parsed) == name
 
 
-def _looks_like_plan_run_dir(dirname: str, path: str) -> bool:
+def _looks_like_plan_run_dir(entry: os.DirEntry) -> bool:
     """A run directory must be UUID-named and contain required marker files."""
-    if not _is_uuid_name(dirname):
+    if not _is_uuid_name(entry.name):
         return False
-    if not os.path.isdir(path):
+    if not entry.is_dir(follow_symlinks=False):
         return False
+    has_start_time = False
+    has_plan = False
     try:
-        filenames = os.listdir(path)
+        with os.scandir(entry.path) as children:
+            for child in children:
+                # Stop testing a suffix once it has been found.
+                name = child.name
+                if not has_start_time and name.endswith(_START_TIME_SUFFIX):
+                    has_start_time = True
+                elif not has_plan and name.endswith(_PLAN_SUFFIX):
+                    has_plan = True
+                if has_start_time and has_plan:
+                    return True
     except OSError:
         return False
-    has_start_time = any(name.endswith(_START_TIME_SUFFIX) for name in filenames)
-    has_plan = any(name.endswith(_PLAN_SUFFIX) for name in filenames)
-    return has_start_time and has_plan
+    return False
 
 
-def purge_old_runs(run_dir: str, max_age_hours: float = 1.0, prefix: str = "myrun_") -> None:
+def _delete_run_dir(item: str, path: str, run_dir: str) -> bool:
+    """Delete one run directory. Returns False and logs the error on failure, so one failure doesn't abort the batch."""
+    logger.debug("Deleting old data: %s from %s", item, run_dir)
+    try:
+        shutil.rmtree(path)  # Delete the directory and all its contents
+    except Exception as e:
+        logger.error(f"Error processing {item} in {run_dir}: {e}")
+        return False
+    return True
+
+
+def purge_old_runs(run_dir: str, max_age_hours: float = 1.0, prefix: str = "myrun_", collect_stats: bool = True) -> None:
     """
     Deletes files and directories in the specified run_dir older than max_age_hours and matching the specified prefix.
+
+    The sweep summary is logged at INFO, with the counters also attached to the log record as `stats`.
+    With collect_stats=False the per-entry skip counters are not maintained; only deletions and errors are counted,
+    and the skip counters are left out of the summary and `stats`.
     """
     if not os.path.isabs(run_dir):
         raise ValueError(f"run_dir must be an absolute path: {run_dir}")
@@ -47,54 +81,84 @@ def purge_old_runs(run_dir: str, max_age_hours: float = 1.0, prefix: str = "myru
         return
 
     logger.info("Running purge...")
-    now = datetime.datetime.now()
-    cutoff = now - datetime.timedelta(hours=max_age_hours)
+    # Compare raw st_mtime floats against the cutoff, so no datetime objects are created per entry.
+    cutoff_ts = time.time() - max_age_hours * 3600.0
 
     count_deleted = 0
     count_skip_without_prefix = 0
     count_skip_recent = 0
     count_skip_non_run_shape = 0
     count_error = 0
-    for item in os.listdir(run_dir):
-        if not item.startswith(prefix):
-            count_skip_without_prefix += 1
-            continue  # Skip files and directories that don't match the prefix
-
-        item_path = os.path.join(run_dir, item)
-        is_dir = os.path.isdir(item_path)
-        if not is_dir:
-            # Never delete files from run root. Users may place arbitrary files there.
-            count_skip_non_run_shape += 1
-            continue
-        if not _looks_like_plan_run_dir(item, item_path):
-            count_skip_non_run_shape += 1
-            continue
-
-        try:
-            # Get the modification time of the item (file or directory)
-            mtime = datetime.datetime.fromtimestamp(os.path.getmtime(item_path))
-
-            if mtime < cutoff:
-                logger.debug(f"Deleting old data: {item} from {run_dir}")
-                if is_dir:
-                    shutil.rmtree(item_path)  # Delete the directory and all its contents
+    to_delete: list[tuple[str, str]] = []
+    # An empty prefix matches everything.
+    check_prefix = bool(prefix)
+    with os.scandir(run_dir) as entries:
+        for entry in entries:
+            item = entry.name
+            if check_prefix and not item.startswith(prefix):
+                if collect_stats:
+                    count_skip_without_prefix += 1
+                continue  # Skip files and directories that don't match the prefix
+
+            # DirEntry.is_dir() uses the file type from the directory listing, so no extra stat is needed.
+            # Symlinks are never followed, so a link to a directory elsewhere is never purged.
+            if not entry.is_dir(follow_symlinks=False):
+                # Never delete files from run root. Users may place arbitrary files there.
+                if collect_stats:
+                    count_skip_non_run_shape += 1
+                continue
+            if not _looks_like_plan_run_dir(entry):
+                if collect_stats:
+                    count_skip_non_run_shape += 1
+                continue
+
+            try:
+                # Get the modification time of the directory
+                mtime = entry.stat(follow_symlinks=False).st_mtime
+
+                if mtime < cutoff_ts:
+                    to_delete.append((item, entry.path))
                 else:
-                    os.remove(item_path)  # Delete the file
-                count_deleted += 1
-            else:
-                logger.debug(f"Skipping {item} in {run_dir}, last modified: {mtime}")
-                count_skip_recent += 1
-
-        except Exception as e:
-            logger.error(f"Error processing {item} in {run_dir}: {e}")
-            count_error += 1
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("Skipping %s in %s, last modified: %s", item, run_dir, datetime.fromtimestamp(mtime))
+                    if collect_stats:
+                        count_skip_recent += 1
+
+            except Exception as e:
+                logger.error(f"Error processing {item} in {run_dir}: {e}")
+                count_error += 1
+
+    if to_delete:
+        with ThreadPoolExecutor(max_workers=_DELETE_MAX_WORKERS, thread_name_prefix="purge_old_runs") as executor:
+            results = list(executor.map(lambda item_and_path: _delete_run_dir(*item_and_path, run_dir), to_delete))
+        count_deleted = sum(results)
+        count_error += len(results) - count_deleted
+
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    if not collect_stats:
+        stats = {
+            "deleted": count_deleted,
+            "errors": count_error,
+        }
+        logger.info(
+            "Purge complete: %(deleted)s deleted, %(errors)s errors (skip counters not collected)",
+            stats,
+            extra={"stats": stats},
+        )
+        return
+    stats = {
+        "deleted": count_deleted,
+        "skipped_recent": count_skip_recent,
+        "skipped_without_prefix": count_skip_without_prefix,
+        "skipped_non_run_shape": count_skip_non_run_shape,
+        "errors": count_error,
+    }
     logger.info(
-        "Purge complete: %s deleted, %s skipped (recent), %s skipped (no prefix), %s skipped (not run artifacts), %s errors",
-        count_deleted,
-        count_skip_recent,
-        count_skip_without_prefix,
-        count_skip_non_run_shape,
-        count_error,
+        "Purge complete: %(deleted)s deleted, %(skipped_recent)s skipped (recent), %(skipped_without_prefix)s skipped (no prefix), "
+        "%(skipped_non_run_shape)s skipped (not run artifacts), %(errors)s errors",
+        stats,
+        extra={"stats": stats},
     )
 
 
@@ -103,9 +167,11 @@ def start_purge_scheduler(
     purge_interval_seconds: float = 3600,
     max_age_hours: float = 1.0,
     prefix: str = "myrun_",
-) -> None:
+) -> threading.Event:
     """
     Start the purge scheduler in a background thread.
+
+    Returns an event; set it to stop the scheduler. The thread wakes up immediately instead of finishing its sleep.
     """
     logger.info(
         "Starting purge scheduler for %s every %s seconds. Prefix: %s. Max age hours: %s",
@@ -118,13 +184,26 @@ def start_purge_scheduler(
     if not os.path.isabs(run_dir):
         raise ValueError(f"run_dir must be an absolute path: {run_dir}")
 
+    stop_event = threading.Event()
+
     def purge_scheduler():
         """
         Schedules the purge_old_runs function to run periodically.
-        """
-        while True:
-            purge_old_runs(run_dir, max_age_hours=max_age_hours, prefix=prefix)
-            time.sleep(purge_interval_seconds)
 
-    purge_thread = threading.Thread(target=purge_scheduler, daemon=True)
+        The interval is measured from the start of one purge to the start of the next,
+        so a slow purge doesn't push the schedule back.
+        """
+        while not stop_event.is_set():
+            started = time.monotonic()
+            try:
+                purge_old_runs(run_dir, max_age_hours=max_age_hours, prefix=prefix)
+            except Exception:
+                # Keep the scheduler alive; the next sweep may succeed.
+                logger.exception("Purge failed for %s", run_dir)
+            remaining = purge_interval_seconds - (time.monotonic() - started)
+            if remaining > 0:
+                stop_event.wait(remaining)
+
+    purge_thread = threading.Thread(target=purge_scheduler, name="purge_scheduler", daemon=True)
     purge_thread.start()
+    return stop_event
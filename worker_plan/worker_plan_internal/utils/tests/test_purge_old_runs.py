@@ -4,7 +4,7 @@ import time
 import unittest
 import uuid
 
-from worker_plan_internal.utils.purge_old_runs import purge_old_runs
+from worker_plan_internal.utils.purge_old_runs import _is_uuid_name, purge_old_runs, start_purge_scheduler
 
 
 class TestPurgeOldRuns(unittest.TestCase):
@@ -72,6 +72,67 @@ class TestPurgeOldRuns(unittest.TestCase):
         purge_old_runs(self.test_run_dir, max_age_hours=1.0, prefix="keepme-")
         self.assertTrue(os.path.exists(os.path.join(self.test_run_dir, prefixed_uuid)))
 
+    @unittest.skipUnless(hasattr(os, "symlink"), "symlinks not supported")
+    def test_purge_does_not_follow_symlinked_run_dirs(self):
+        link_name = str(uuid.uuid4())
+        link_path = os.path.join(self.test_run_dir, link_name)
+        os.symlink(os.path.join(self.test_run_dir, self.uuid_old_valid), link_path)
+        purge_old_runs(self.test_run_dir, max_age_hours=1.0, prefix="")
+        self.assertTrue(os.path.islink(link_path))
+
+    def test_purge_logs_stats(self):
+        logger_name = "worker_plan_internal.utils.purge_old_runs"
+        with self.assertLogs(logger_name, level="INFO") as captured:
+            purge_old_runs(self.test_run_dir, max_age_hours=1.0, prefix="")
+        summary = captured.records[-1]
+        self.assertEqual(summary.stats, {
+            "deleted": 1,
+            "skipped_recent": 1,
+            "skipped_without_prefix": 0,
+            "skipped_non_run_shape": 6,
+            "errors": 0,
+        })
+        self.assertIn("1 deleted", summary.getMessage())
+
+    def test_purge_without_collect_stats(self):
+        logger_name = "worker_plan_internal.utils.purge_old_runs"
+        with self.assertLogs(logger_name, level="INFO") as captured:
+            purge_old_runs(self.test_run_dir, max_age_hours=1.0, prefix="", collect_stats=False)
+        self.assertFalse(os.path.exists(os.path.join(self.test_run_dir, self.uuid_old_valid)))
+        summary = captured.records[-1]
+        self.assertEqual(summary.stats, {"deleted": 1, "errors": 0})
+        self.assertNotIn("skipped", summary.getMessage())
+
+    def test_purge_deletes_many_old_run_dirs(self):
+        many = [str(uuid.uuid4()) for _ in range(20)]
+        for dirname in many:
+            self._create_run_dir(dirname, hours_old=2.0, with_start=True, with_plan=True)
+        purge_old_runs(self.test_run_dir, max_age_hours=1.0, prefix="")
+        for dirname in many:
+            self.assertFalse(os.path.exists(os.path.join(self.test_run_dir, dirname)))
+        self.assertTrue(os.path.exists(os.path.join(self.test_run_dir, self.uuid_recent_valid)))
+
+    def test_purge_scheduler_runs_and_stops(self):
+        stop_event = start_purge_scheduler(self.test_run_dir, purge_interval_seconds=3600, max_age_hours=1.0, prefix="")
+        try:
+            deadline = time.monotonic() + 5.0
+            old_valid_path = os.path.join(self.test_run_dir, self.uuid_old_valid)
+            while os.path.exists(old_valid_path) and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertFalse(os.path.exists(old_valid_path))
+        finally:
+            stop_event.set()
+
+
+class TestIsUuidName(unittest.TestCase):
+    def test_is_uuid_name(self):
+        self.assertTrue(_is_uuid_name(str(uuid.uuid4())))
+        self.assertFalse(_is_uuid_name("random.txt"))
+        self.assertFalse(_is_uuid_name(str(uuid.uuid4()) + ".zip"))
+        self.assertFalse(_is_uuid_name(str(uuid.uuid4()).upper()))
+        self.assertFalse(_is_uuid_name(str(uuid.uuid4()).replace("-", "")))
+        self.assertFalse(_is_uuid_name("zzzzzzzz-zzzz-zzzz-zzzz-zzzzzzzzzzzz"))
+
 
 if __name__ == "__main__":
     unittest.main()
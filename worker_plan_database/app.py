@@ -6,20 +6,22 @@ PROMPT> PLANEXE_WORKER_ID=1 python -m app.py
 """
 from datetime import UTC, datetime
 from decimal import Decimal
-import json
 import os
 import shutil
 import sys
 import time
 import logging
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional
+from typing import Any, Optional
 from urllib.parse import quote_plus
 import uuid
-import io
-import zipfile
+from concurrent.futures import ThreadPoolExecutor
 import requests
-from sqlalchemy import inspect, text, or_
+from requests.adapters import HTTPAdapter
+import orjson
+from sqlalchemy import insert, inspect, select, text, update
+from sqlalchemy.engine import Connection, Inspector
 
 # Load .env file early, before any imports that require environment variables (e.g., machai.py).
 # This allows configuration via .env file instead of shell exports.
@@ -55,6 +57,12 @@ PLANEXE_CONFIG_PATH_VAR = BASE_DIR
 BROWSER_INACTIVE_AFTER_N_SECONDS = 80
 CONTINUE_GENERATING_PLAN_DESPITE_BROWSER_INACTIVE = True
 HEARTBEAT_INTERVAL_IN_SECONDS = 60
+# Heartbeats that report the same current task again within this window are dropped, e.g. one per pipeline progress tick.
+HEARTBEAT_MIN_INTERVAL_IN_SECONDS = 10
+# New pending tasks wake the worker via LISTEN/NOTIFY. Polling on this interval is only a safety net for missed notifications.
+PENDING_TASK_POLL_INTERVAL_IN_SECONDS = 30
+# Without LISTEN/NOTIFY (e.g. not Postgres, or the listener connection is down), poll this often.
+PENDING_TASK_POLL_INTERVAL_WITHOUT_NOTIFY_IN_SECONDS = 5
 CREDIT_SCALE = Decimal("0.000000001")
 
 # --- Configure Logging Section ---
@@ -70,11 +78,10 @@ if invalid_log_level:
 stream_handler = logging.StreamHandler(sys.stdout)
 stream_handler.setFormatter(log_formatter)
 
-logging.basicConfig(
-    level=log_level,
-    handlers=[stream_handler],
-    force=True
-)
+# Replace the root handlers directly; this is what basicConfig(force=True) does, without its extra bookkeeping.
+root_logger = logging.getLogger()
+root_logger.handlers = [stream_handler]
+root_logger.setLevel(log_level)
 
 # Capture standard warnings and route them through the logging system.
 logging.captureWarnings(True) # 'py.warnings' logger will propagate to root.
@@ -83,7 +90,7 @@ logging.captureWarnings(True) # 'py.warnings' logger will propagate to root.
 logger = logging.getLogger(__name__) # Gets __main__ logger
 if invalid_log_level:
     logger.warning("Invalid PLANEXE_LOG_LEVEL provided; defaulting to INFO.")
-root_handlers = [type(h).__name__ for h in logging.getLogger().handlers]
+root_handlers = [type(h).__name__ for h in root_logger.handlers]
 logger.info(
     "Logging configured for worker_plan_database (level=%s, handlers=%s, stream=%s)",
     logging.getLevelName(log_level),
@@ -103,14 +110,41 @@ loggers_to_redirect_via_root = {
     'httpx': logging.WARNING,
 }
 
+# None of these loggers has handlers of its own at this point (luigi's logging setup is disabled above),
+# and loggers propagate to root by default. Only the level needs setting.
 for name, level in loggers_to_redirect_via_root.items():
-    lg = logging.getLogger(name)
-    lg.setLevel(level)
-    lg.handlers = []
-    lg.propagate = True
+    logging.getLogger(name).setLevel(level)
 
 logger.debug("Logging fully configured. All configured loggers now write to stdout via root.")
 
+# --- Billing settings ---
+# Resolved once at startup, instead of parsing the environment for every completed task.
+# An invalid value is reported here and replaced by the default, rather than failing the billing of a task later.
+def _float_from_env(name: str, default: float) -> float:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        logger.warning(f"Invalid {name}={value!r}; defaulting to {default}.")
+        return default
+
+def _int_from_env(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        # A fractional value such as "2.5" is rejected, rather than silently truncated.
+        logger.warning(f"Invalid {name}={value!r}, expected a whole number; defaulting to {default}.")
+        return default
+
+CREDIT_PRICE_CENTS = max(1, _int_from_env("PLANEXE_CREDIT_PRICE_CENTS", 100))
+SUCCESS_PLAN_FEE_USD = _float_from_env("PLANEXE_SUCCESS_PLAN_FEE_USD", 1.0)
+logger.info(f"Billing: PLANEXE_CREDIT_PRICE_CENTS={CREDIT_PRICE_CENTS}, PLANEXE_SUCCESS_PLAN_FEE_USD={SUCCESS_PLAN_FEE_USD}")
+
 # --- Environment Setup ---
 os.environ["PLANEXE_CONFIG_PATH"] = str(PLANEXE_CONFIG_PATH_VAR)
 logger.debug(f"PLANEXE_CONFIG_PATH set to: {PLANEXE_CONFIG_PATH_VAR}")
@@ -126,7 +160,7 @@ try:
     from worker_plan_api.start_time import StartTime
     from worker_plan_api.plan_file import PlanFile
     from worker_plan_internal.plan.filenames import FilenameEnum
-    from worker_plan_api.planexe_dotenv import PlanExeDotEnv
+    from worker_plan_api.planexe_dotenv import DotEnvKeyEnum, PlanExeDotEnv
     from worker_plan_internal.llm_util.llm_executor import LLMModelFromName, PipelineStopRequested
     from worker_plan_internal.llm_util.token_instrumentation import set_current_task_id, set_current_user_id
     from worker_plan_internal.llm_util.track_activity import TrackActivity
@@ -142,6 +176,8 @@ try:
     from database_api.model_token_metrics import TokenMetrics
     from worker_plan_database.speedvsdetail import resolve_speedvsdetail
     from worker_plan_database.machai import MachAI
+    from worker_plan_database.run_zip import create_zip_bytes
+    from worker_plan_database.task_notify import TaskPendingListener, ensure_task_pending_notify_trigger
     from flask import Flask
     logger.debug("All modules imported successfully.")
 except ImportError as e:
@@ -151,20 +187,47 @@ except ImportError as e:
 planexe_dotenv = PlanExeDotEnv.load()
 logger.info(f"{Path(__file__).name}. planexe_dotenv: {planexe_dotenv!r}")
 
+# Optional memory-backed directory (e.g. /dev/shm) for FAST_BUT_SKIP_DETAILS runs. Their files are stored in the zip snapshot
+# and deleted right after the task, so they don't need to hit the disk. Unset by default, since outputs in it
+# are not visible to services that read the shared PLANEXE_RUN_DIR volume while the task runs.
+_fast_run_dir_value = os.environ.get(DotEnvKeyEnum.PLANEXE_FAST_RUN_DIR.value)
+FAST_RUN_DIR: Optional[Path] = Path(_fast_run_dir_value).resolve() if _fast_run_dir_value else None
+if FAST_RUN_DIR is not None and not FAST_RUN_DIR.is_dir():
+    FAST_RUN_DIR = None
+if _fast_run_dir_value and FAST_RUN_DIR is None:
+    logger.warning(f"PLANEXE_FAST_RUN_DIR={_fast_run_dir_value!r} is not a directory; fast runs use PLANEXE_RUN_DIR.")
+
+def postgres_sqlalchemy_driver() -> str:
+    """
+    Prefer psycopg 3. It sends bytes parameters (the run_zip_snapshot BYTEA) in binary format,
+    where psycopg2 sends them as hex-escaped text of twice the size. Fall back to psycopg2 when psycopg 3 is not installed.
+    """
+    try:
+        import psycopg  # noqa: F401
+    except ImportError:
+        return "psycopg2"
+    return "psycopg"
+
 def build_postgres_uri_from_env(env: dict[str, str]) -> tuple[str, dict[str, str]]:
     """Construct a SQLAlchemy URI for Postgres using environment variables."""
+    driver = postgres_sqlalchemy_driver()
     host = env.get("PLANEXE_POSTGRES_HOST") or "database_postgres"
     port = str(env.get("PLANEXE_POSTGRES_PORT") or "5432")
     dbname = env.get("PLANEXE_POSTGRES_DB") or "planexe"
     user = env.get("PLANEXE_POSTGRES_USER") or "planexe"
     password = env.get("PLANEXE_POSTGRES_PASSWORD") or "planexe"
-    uri = f"postgresql+psycopg2://{quote_plus(user)}:{quote_plus(password)}@{host}:{port}/{dbname}"
-    safe_config = {"host": host, "port": port, "dbname": dbname, "user": user}
+    uri = f"postgresql+{driver}://{quote_plus(user)}:{quote_plus(password)}@{host}:{port}/{dbname}"
+    safe_config = {"host": host, "port": port, "dbname": dbname, "user": user, "driver": driver}
     return uri, safe_config
 
 PIPELINE_CONFIG.enable_csv_export = True
 logger.info(f"PIPELINE_CONFIG: {PIPELINE_CONFIG!r}")
 
+# llm_config.json is loaded once per process, so the prioritized model list is the same for every task.
+# Resolve it here, instead of per task. The tuples keep tasks from mutating the shared lists.
+LLM_MODELS: tuple[str, ...] = tuple(ExecutePipeline.resolve_llm_models(None))
+PING_LLM_MODELS = tuple(LLMModelFromName.from_names(list(LLM_MODELS)))
+
 # Initialize Flask app for database access
 app = Flask(__name__)
 app.config.from_pyfile('config.py')
@@ -175,104 +238,144 @@ if sqlalchemy_database_uri is None:
 else:
     logger.info("Using SQLALCHEMY_DATABASE_URI from environment or .env file.")
 app.config['SQLALCHEMY_DATABASE_URI'] = sqlalchemy_database_uri
+
 app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'pool_recycle' : 280, 'pool_pre_ping': True}
 db.init_app(app)
 
-def ensure_taskitem_artifact_columns() -> None:
-    insp = inspect(db.engine)
-    columns = {col["name"] for col in insp.get_columns("task_item")}
-    with db.engine.begin() as conn:
-        if "generated_report_html" not in columns:
-            conn.execute(text("ALTER TABLE task_item ADD COLUMN IF NOT EXISTS generated_report_html TEXT"))
-        if "run_zip_snapshot" not in columns:
-            conn.execute(text("ALTER TABLE task_item ADD COLUMN IF NOT EXISTS run_zip_snapshot BYTEA"))
-        if "stop_requested" not in columns:
-            conn.execute(text("ALTER TABLE task_item ADD COLUMN IF NOT EXISTS stop_requested BOOLEAN"))
-        if "stop_requested_timestamp" not in columns:
-            conn.execute(text("ALTER TABLE task_item ADD COLUMN IF NOT EXISTS stop_requested_timestamp TIMESTAMP"))
-
-
-def ensure_token_metrics_columns() -> None:
-    insp = inspect(db.engine)
-    if "token_metrics" not in insp.get_table_names():
+def _columns(insp: Inspector, table_name: str, column_cache: dict[str, set[str]]) -> set[str]:
+    """Column names of a table. Each get_columns() is a round-trip to the catalog, so it's read once per ensure_schema() run."""
+    columns = column_cache.get(table_name)
+    if columns is None:
+        columns = {col["name"] for col in insp.get_columns(table_name)}
+        column_cache[table_name] = columns
+    return columns
+
+
+def ensure_taskitem_artifact_columns(insp: Inspector, conn: Connection, column_cache: dict[str, set[str]]) -> None:
+    columns = _columns(insp, "task_item", column_cache)
+    if "generated_report_html" not in columns:
+        conn.execute(text("ALTER TABLE task_item ADD COLUMN IF NOT EXISTS generated_report_html TEXT"))
+    if "run_zip_snapshot" not in columns:
+        conn.execute(text("ALTER TABLE task_item ADD COLUMN IF NOT EXISTS run_zip_snapshot BYTEA"))
+    if "stop_requested" not in columns:
+        conn.execute(text("ALTER TABLE task_item ADD COLUMN IF NOT EXISTS stop_requested BOOLEAN"))
+    if "stop_requested_timestamp" not in columns:
+        conn.execute(text("ALTER TABLE task_item ADD COLUMN IF NOT EXISTS stop_requested_timestamp TIMESTAMP"))
+
+
+def ensure_token_metrics_columns(insp: Inspector, conn: Connection, table_names: set[str], column_cache: dict[str, set[str]]) -> None:
+    if "token_metrics" not in table_names:
         return
-    columns = {col["name"] for col in insp.get_columns("token_metrics")}
-    with db.engine.begin() as conn:
-        # Remove legacy identifiers. Token metrics should reference tasks only.
-        if "run_id" in columns:
-            conn.execute(text("ALTER TABLE token_metrics DROP COLUMN IF EXISTS run_id"))
-        if "task_name" in columns:
-            conn.execute(text("ALTER TABLE token_metrics DROP COLUMN IF EXISTS task_name"))
-        if "task_id" not in columns:
-            conn.execute(text("ALTER TABLE token_metrics ADD COLUMN IF NOT EXISTS task_id VARCHAR(255)"))
-        if "user_id" not in columns:
-            conn.execute(text("ALTER TABLE token_metrics ADD COLUMN IF NOT EXISTS user_id VARCHAR(255)"))
-        if "upstream_provider" not in columns:
-            conn.execute(text("ALTER TABLE token_metrics ADD COLUMN IF NOT EXISTS upstream_provider VARCHAR(255)"))
-        if "upstream_model" not in columns:
-            conn.execute(text("ALTER TABLE token_metrics ADD COLUMN IF NOT EXISTS upstream_model VARCHAR(255)"))
-        if "cost_usd" not in columns:
-            conn.execute(text("ALTER TABLE token_metrics ADD COLUMN IF NOT EXISTS cost_usd DOUBLE PRECISION"))
-
-
-def ensure_fractional_credit_columns() -> None:
-    if db.engine.dialect.name != "postgresql":
+    columns = _columns(insp, "token_metrics", column_cache)
+    # Remove legacy identifiers. Token metrics should reference tasks only.
+    if "run_id" in columns:
+        conn.execute(text("ALTER TABLE token_metrics DROP COLUMN IF EXISTS run_id"))
+    if "task_name" in columns:
+        conn.execute(text("ALTER TABLE token_metrics DROP COLUMN IF EXISTS task_name"))
+    if "task_id" not in columns:
+        conn.execute(text("ALTER TABLE token_metrics ADD COLUMN IF NOT EXISTS task_id VARCHAR(255)"))
+    if "user_id" not in columns:
+        conn.execute(text("ALTER TABLE token_metrics ADD COLUMN IF NOT EXISTS user_id VARCHAR(255)"))
+    if "upstream_provider" not in columns:
+        conn.execute(text("ALTER TABLE token_metrics ADD COLUMN IF NOT EXISTS upstream_provider VARCHAR(255)"))
+    if "upstream_model" not in columns:
+        conn.execute(text("ALTER TABLE token_metrics ADD COLUMN IF NOT EXISTS upstream_model VARCHAR(255)"))
+    if "cost_usd" not in columns:
+        conn.execute(text("ALTER TABLE token_metrics ADD COLUMN IF NOT EXISTS cost_usd DOUBLE PRECISION"))
+
+
+def ensure_fractional_credit_columns(conn: Connection, table_names: set[str]) -> None:
+    if conn.dialect.name != "postgresql":
         return
+    if "user_account" in table_names:
+        conn.execute(text(
+            "ALTER TABLE user_account "
+            "ALTER COLUMN credits_balance TYPE NUMERIC(18,9) "
+            "USING credits_balance::NUMERIC(18,9)"
+        ))
+        conn.execute(text("ALTER TABLE user_account ALTER COLUMN credits_balance SET DEFAULT 0"))
+    if "credit_history" in table_names:
+        conn.execute(text(
+            "ALTER TABLE credit_history "
+            "ALTER COLUMN delta TYPE NUMERIC(18,9) "
+            "USING delta::NUMERIC(18,9)"
+        ))
+    if "payment_record" in table_names:
+        conn.execute(text(
+            "ALTER TABLE payment_record "
+            "ALTER COLUMN credits TYPE NUMERIC(18,9) "
+            "USING credits::NUMERIC(18,9)"
+        ))
+
+
+def ensure_schema() -> None:
+    """
+    Bring older databases up to date with the current models.
+
+    Uses one Inspector for all the catalog lookups, and runs all the DDL in a single transaction.
+    """
     insp = inspect(db.engine)
     table_names = set(insp.get_table_names())
+    column_cache: dict[str, set[str]] = {}
     with db.engine.begin() as conn:
-        if "user_account" in table_names:
-            conn.execute(text(
-                "ALTER TABLE user_account "
-                "ALTER COLUMN credits_balance TYPE NUMERIC(18,9) "
-                "USING credits_balance::NUMERIC(18,9)"
-            ))
-            conn.execute(text("ALTER TABLE user_account ALTER COLUMN credits_balance SET DEFAULT 0"))
-        if "credit_history" in table_names:
-            conn.execute(text(
-                "ALTER TABLE credit_history "
-                "ALTER COLUMN delta TYPE NUMERIC(18,9) "
-                "USING delta::NUMERIC(18,9)"
-            ))
-        if "payment_record" in table_names:
-            conn.execute(text(
-                "ALTER TABLE payment_record "
-                "ALTER COLUMN credits TYPE NUMERIC(18,9) "
-                "USING credits::NUMERIC(18,9)"
-            ))
+        ensure_taskitem_artifact_columns(insp, conn, column_cache)
+        ensure_token_metrics_columns(insp, conn, table_names, column_cache)
+        ensure_fractional_credit_columns(conn, table_names)
+
+def add_event(event_type: EventType, message: str, context: Optional[dict[str, Any]]) -> None:
+    """
+    Insert an EventItem in the current transaction; the caller commits.
+    Events are append-only and never read back by the worker, so a Core INSERT is used,
+    skipping the ORM's identity map and unit of work.
+    """
+    db.session.execute(insert(EventItem).values(event_type=event_type, message=message, context=context))
 
 def worker_process_started() -> None:
     planexe_worker_id = os.environ.get("PLANEXE_WORKER_ID")
     event_context = {
         "pid": str(os.getpid()),
-        "WORKER_ID": str(WORKER_ID),
+        "WORKER_ID": WORKER_ID,
         "environment variable PLANEXE_WORKER_ID": str(planexe_worker_id)
     }
     if planexe_worker_id != WORKER_ID:
         event_context["issue with worker_id"] = "ERROR: PLANEXE_WORKER_ID != WORKER_ID. This is an inconsistency. The process may have been started without a PLANEXE_WORKER_ID environment variable."
 
     with app.app_context():
-        event = EventItem(
-            event_type=EventType.GENERIC_EVENT,
-            message="Worker started",
-            context=event_context
-        )
-        db.session.add(event)
+        add_event(EventType.GENERIC_EVENT, "Worker started", event_context)
         db.session.commit()
 
 worker_process_started()
 
+# Postgres SQLSTATEs for serialization_failure and deadlock_detected. Re-running the transaction right away
+# is the documented remedy, so there is no point in sleeping before the retry.
+_TRANSACTION_CONFLICT_SQLSTATES = {"40001", "40P01"}
+
+
+def _is_transaction_conflict(exc: Exception) -> bool:
+    orig = getattr(exc, "orig", None)
+    sqlstate = getattr(orig, "pgcode", None) or getattr(orig, "sqlstate", None)
+    return sqlstate in _TRANSACTION_CONFLICT_SQLSTATES
+
+
 def update_task_state_with_retry(task_id: str, new_state: TaskState, max_retries: int = 3, retry_delay: int = 5) -> bool:
-    """Helper function to update task state with retry logic for database operations."""
+    """
+    Helper function to update task state with retry logic for database operations.
+
+    The row is read with SELECT ... FOR UPDATE, so the check and the update are atomic with respect to
+    other writers (e.g. the frontend touching last_seen_timestamp), instead of racing them and retrying.
+    Transaction conflicts are retried immediately; other errors are retried after `retry_delay` seconds.
+    """
     for attempt in range(max_retries):
         try:
-            task = db.session.get(TaskItem, task_id)
+            task = db.session.get(TaskItem, task_id, with_for_update=True)
             if task is None:
                 logger.error(f"Task with ID {task_id!r} not found in database. Cannot update task state.")
+                db.session.rollback()
                 return False
             if task.state == new_state:
                 logger.info(f"Task {task_id!r} already in state {new_state}. No update needed.")
-                return True            
+                db.session.rollback()
+                return True
             task.state = new_state
             db.session.commit()
             logger.info(f"Updated task {task_id!r} state to {new_state}")
@@ -281,17 +384,26 @@ def update_task_state_with_retry(task_id: str, new_state: TaskState, max_retries
             logger.error(f"Database error updating task state (attempt {attempt + 1}/{max_retries}): {e}", exc_info=True)
             db.session.rollback()
             if attempt < max_retries - 1:
+                if _is_transaction_conflict(e):
+                    logger.info("Transaction conflict. Retrying immediately...")
+                    continue
                 logger.info(f"Retrying in {retry_delay} seconds...")
                 time.sleep(retry_delay)
             else:
                 logger.error("Max retries reached for task state update")
                 return False
 
-def update_task_progress_with_retry(task_id: str, progress_percentage: float, progress_message: str, max_retries: int = 3, retry_delay: int = 5) -> bool:
-    """Helper function to update task progress with retry logic for database operations."""
+def update_task_progress_with_retry(task_id: str, progress_percentage: float, progress_message: str, max_retries: int = 3, retry_delay: int = 5, task: Optional[TaskItem] = None) -> bool:
+    """
+    Helper function to update task progress with retry logic for database operations.
+
+    Pass `task` when the caller already holds the row in the current session, to skip fetching it again.
+    Retries always re-fetch, since the rollback expires the row.
+    """
     for attempt in range(max_retries):
         try:
-            task = db.session.get(TaskItem, task_id)
+            if task is None or attempt > 0:
+                task = db.session.get(TaskItem, task_id)
             if task is None:
                 logger.error(f"Task with ID {task_id!r} not found in database. Cannot update task progress.")
                 return False
@@ -312,6 +424,28 @@ def update_task_progress_with_retry(task_id: str, progress_percentage: float, pr
                 return False
 
 
+_last_heartbeat_monotonic: Optional[float] = None
+_last_heartbeat_task_id: Optional[str] = None
+
+def upsert_worker_heartbeat(current_task_id: Optional[str] = None, force: bool = False) -> None:
+    """
+    Write this worker's heartbeat, unless the same current_task_id was written less than
+    HEARTBEAT_MIN_INTERVAL_IN_SECONDS ago. A change of current_task_id is always written. Requires an app context.
+    """
+    global _last_heartbeat_monotonic, _last_heartbeat_task_id
+    now = time.monotonic()
+    if (
+        not force
+        and _last_heartbeat_monotonic is not None
+        and current_task_id == _last_heartbeat_task_id
+        and now - _last_heartbeat_monotonic < HEARTBEAT_MIN_INTERVAL_IN_SECONDS
+    ):
+        return
+    WorkerItem.upsert_heartbeat(worker_id=WORKER_ID, current_task_id=current_task_id)
+    _last_heartbeat_monotonic = now
+    _last_heartbeat_task_id = current_task_id
+
+
 class ServerExecutePipeline(ExecutePipeline):
     def __init__(self, task_id: str, run_id_dir: Path, speedvsdetail: SpeedVsDetailEnum, llm_models: list[str]):
         super().__init__(run_id_dir=run_id_dir, speedvsdetail=speedvsdetail, llm_models=llm_models)
@@ -320,60 +454,60 @@ class ServerExecutePipeline(ExecutePipeline):
     def _handle_task_completion(self, parameters: HandleTaskCompletionParameters) -> None:
         logger.debug(f"ServerExecutePipeline._handle_task_completion")
 
+        # One app context and one fetch of the TaskItem per progress tick.
         with app.app_context():
-            WorkerItem.upsert_heartbeat(worker_id=WORKER_ID, current_task_id=self.task_id)
+            upsert_worker_heartbeat(current_task_id=self.task_id)
 
-        # Lookup the taskitem in the database by self.task_id
-        with app.app_context():
+            # Lookup the taskitem in the database by self.task_id
             task = db.session.get(TaskItem, self.task_id)
             if task is None:
                 logger.error(f"Task with ID {self.task_id!r} not found in database, while running the pipeline. This is an inconsistency.")
                 raise Exception(f"Task with ID {self.task_id!r} not found in database, while running the pipeline. This is an inconsistency.")
             stop_requested = bool(task.stop_requested)
 
-        if task.last_seen_timestamp is None:
-            # A new TaskItem is supposed to have a last_seen_timestamp.
-            # If it doesn't have a last_seen_timestamp, it's an inconsistency that should be fixed.
-            logger.error(f"Task with ID {self.task_id!r} has no last_seen_timestamp. This is an inconsistency.")
-            raise Exception(f"Task with ID {self.task_id!r} has no last_seen_timestamp. This is an inconsistency.")
+            if task.last_seen_timestamp is None:
+                # A new TaskItem is supposed to have a last_seen_timestamp.
+                # If it doesn't have a last_seen_timestamp, it's an inconsistency that should be fixed.
+                logger.error(f"Task with ID {self.task_id!r} has no last_seen_timestamp. This is an inconsistency.")
+                raise Exception(f"Task with ID {self.task_id!r} has no last_seen_timestamp. This is an inconsistency.")
 
-        if stop_requested:
-            logger.info("Stopping task %s because a stop was requested.", self.task_id)
-            with app.app_context():
+            if stop_requested:
+                logger.info("Stopping task %s because a stop was requested.", self.task_id)
                 update_task_progress_with_retry(
                     task_id=self.task_id,
                     progress_percentage=parameters.progress.progress_percentage,
                     progress_message="Stop requested by user.",
+                    task=task,
                 )
-            raise PipelineStopRequested(f"Stopping task {self.task_id!r} because a stop was requested.")
-
-        # Detect if the browser has been inactive for N seconds.
-        # Make last_seen_timestamp timezone-aware if it isn't already
-        last_seen_aware = task.last_seen_timestamp
-        if last_seen_aware.tzinfo is None:
-            last_seen_aware = last_seen_aware.replace(tzinfo=UTC)
-        
-        limit = BROWSER_INACTIVE_AFTER_N_SECONDS
-        time_since_last_seen = (datetime.now(UTC) - last_seen_aware).total_seconds()
-        if time_since_last_seen > limit:
-            # The browser has been inactive for more than N seconds. 
-            # The user appears to have navigated away from the progress bar page, or closed the browser.
-            if CONTINUE_GENERATING_PLAN_DESPITE_BROWSER_INACTIVE:
-                logger.debug(f"Task {self.task_id!r} has been inactive for {time_since_last_seen} seconds. Continuing to generate the plan.")
-            else:
-                # Optimization: Stop generating the plan and save resources. So other users can use the server.
-                logger.info(f"Stopping task {self.task_id!r} because it the browser has not been active for {limit} seconds")
-                raise PipelineStopRequested(f"Stopping task {self.task_id!r} because it the browser has not been active for {limit} seconds")
-        
-        # The browser is still open and the progress bar is visible. 
-        # The user is still interested in continuing generating the plan.
-        logger.info(f"Task {self.task_id!r} is still active. The user is still interested in continuing generating the plan.")
+                raise PipelineStopRequested(f"Stopping task {self.task_id!r} because a stop was requested.")
+
+            # Detect if the browser has been inactive for N seconds.
+            # Make last_seen_timestamp timezone-aware if it isn't already
+            last_seen_aware = task.last_seen_timestamp
+            if last_seen_aware.tzinfo is None:
+                last_seen_aware = last_seen_aware.replace(tzinfo=UTC)
+
+            limit = BROWSER_INACTIVE_AFTER_N_SECONDS
+            time_since_last_seen = (datetime.now(UTC) - last_seen_aware).total_seconds()
+            if time_since_last_seen > limit:
+                # The browser has been inactive for more than N seconds.
+                # The user appears to have navigated away from the progress bar page, or closed the browser.
+                if CONTINUE_GENERATING_PLAN_DESPITE_BROWSER_INACTIVE:
+                    logger.debug(f"Task {self.task_id!r} has been inactive for {time_since_last_seen} seconds. Continuing to generate the plan.")
+                else:
+                    # Optimization: Stop generating the plan and save resources. So other users can use the server.
+                    logger.info(f"Stopping task {self.task_id!r} because it the browser has not been active for {limit} seconds")
+                    raise PipelineStopRequested(f"Stopping task {self.task_id!r} because it the browser has not been active for {limit} seconds")
+
+            # The browser is still open and the progress bar is visible.
+            # The user is still interested in continuing generating the plan.
+            logger.info(f"Task {self.task_id!r} is still active. The user is still interested in continuing generating the plan.")
 
-        with app.app_context():
             update_task_progress_with_retry(
-                task_id=self.task_id, 
-                progress_percentage=parameters.progress.progress_percentage, 
-                progress_message=parameters.progress.progress_message
+                task_id=self.task_id,
+                progress_percentage=parameters.progress.progress_percentage,
+                progress_message=parameters.progress.progress_message,
+                task=task,
             )
 
 # Every time a LLM/reasoning model is used, it gets registered in the "track_activity" file.
@@ -388,29 +522,15 @@ track_activity_fallback_path = BASE_DIR_RUN / track_activity_file_name_fallback
 track_activity = TrackActivity(jsonl_file_path=track_activity_fallback_path, write_to_logger=False)
 get_dispatcher().add_event_handler(track_activity)
 
-def create_zip_bytes(run_dir: Path) -> bytes:
+@lru_cache(maxsize=64)
+def _parse_inference_cost_usd(activity_overview_path: str, mtime_ns: int, size: int) -> float:
     """
-    Create an in-memory zip of a run directory (skipping log.txt) and return the bytes.
+    Parse total_cost from an activity_overview.json file.
+    Cached on the file's (path, mtime_ns, size), so the file is only parsed again after it has changed.
     """
-    buffer = io.BytesIO()
-    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zipf:
-        for root, _, files in os.walk(run_dir):
-            for file in files:
-                if file == "log.txt":
-                    continue
-                file_path = Path(root) / file
-                zipf.write(file_path, file_path.relative_to(run_dir))
-    buffer.seek(0)
-    return buffer.read()
-
-
-def _read_inference_cost_usd_from_run_dir(run_id_dir: Path) -> float:
-    """Extract total inference cost from activity_overview.json for a run."""
-    activity_overview_path = run_id_dir / ExtraFilenameEnum.ACTIVITY_OVERVIEW_JSON.value
-    if not activity_overview_path.exists():
-        return 0.0
     try:
-        payload = json.loads(activity_overview_path.read_text(encoding="utf-8"))
+        with open(activity_overview_path, "rb") as f:
+            payload = orjson.loads(f.read())
     except Exception as exc:
         logger.warning("Unable to parse %s: %s", activity_overview_path, exc)
         return 0.0
@@ -421,126 +541,194 @@ def _read_inference_cost_usd_from_run_dir(run_id_dir: Path) -> float:
     except (TypeError, ValueError):
         return 0.0
 
+def _read_inference_cost_usd_from_run_dir(run_id_dir: Path) -> float:
+    """Extract total inference cost from activity_overview.json for a run."""
+    activity_overview_path = run_id_dir / ExtraFilenameEnum.ACTIVITY_OVERVIEW_JSON.value
+    try:
+        stat_result = activity_overview_path.stat()
+    except OSError:
+        return 0.0
+    return _parse_inference_cost_usd(str(activity_overview_path), stat_result.st_mtime_ns, stat_result.st_size)
+
 
 def _credits_for_usd(usd_amount: float) -> Decimal:
     """Convert USD amount to credits with fractional precision."""
     if usd_amount <= 0:
         return Decimal("0").quantize(CREDIT_SCALE)
-    credit_price_cents = max(1, int(os.environ.get("PLANEXE_CREDIT_PRICE_CENTS", "100")))
-    credit_price_usd = Decimal(str(credit_price_cents)) / Decimal("100")
+    credit_price_usd = Decimal(CREDIT_PRICE_CENTS) / Decimal("100")
     usd_decimal = Decimal(str(usd_amount))
     return (usd_decimal / credit_price_usd).quantize(CREDIT_SCALE)
 
 
-def _charge_usage_credits_once(task_id: str, run_id_dir: Path, success: bool) -> dict[str, float | Decimal | bool]:
+def _billing_result(usage_cost_usd: float, success_fee_usd: float, total_charge_usd: float, charged_credits: Decimal, charged: bool) -> dict[str, float | Decimal | bool]:
+    return {
+        "usage_cost_usd": usage_cost_usd,
+        "success_fee_usd": success_fee_usd,
+        "total_charge_usd": total_charge_usd,
+        "charged_credits": charged_credits,
+        "charged": charged,
+    }
+
+
+def _billing_event_fields(billing_result: dict[str, float | Decimal | bool]) -> dict[str, str]:
+    return {
+        "billing_usage_cost_usd": str(billing_result["usage_cost_usd"]),
+        "billing_success_fee_usd": str(billing_result["success_fee_usd"]),
+        "billing_total_charge_usd": str(billing_result["total_charge_usd"]),
+        "billing_charged_credits": str(billing_result["charged_credits"]),
+        "billing_charge_applied": str(billing_result["charged"]),
+    }
+
+
+def _charge_usage_credits(task: TaskItem, success: bool, usage_cost_usd: float) -> dict[str, float | Decimal | bool]:
     """
     Charge user credits once per task, based on inference cost plus success fee.
 
+    Adds the balance change and the ledger row to the current session without committing,
+    so the caller can commit them together with the task's final state.
     Returns diagnostic values for logging and events.
     """
-    usage_cost_usd = _read_inference_cost_usd_from_run_dir(run_id_dir)
     success_fee_usd = 0.0
     should_charge = True
 
-    with app.app_context():
-        task = db.session.get(TaskItem, task_id)
-        if task is None:
-            logger.warning("Unable to bill task %s: task row not found.", task_id)
-            return {
-                "usage_cost_usd": usage_cost_usd,
-                "success_fee_usd": success_fee_usd,
-                "total_charge_usd": usage_cost_usd,
-                "charged_credits": Decimal("0"),
-                "charged": False,
-            }
-
-        if isinstance(task.parameters, dict) and bool(task.parameters.get("billing_skip_usage_charge")):
-            should_charge = False
+    if isinstance(task.parameters, dict) and bool(task.parameters.get("billing_skip_usage_charge")):
+        should_charge = False
 
+    user = None
+    try:
+        user_uuid = uuid.UUID(str(task.user_id))
+        user = db.session.get(UserAccount, user_uuid)
+    except Exception:
         user = None
-        try:
-            user_uuid = uuid.UUID(str(task.user_id))
-            user = db.session.get(UserAccount, user_uuid)
-        except Exception:
-            user = None
 
-        if user is None:
-            should_charge = False
+    if user is None:
+        should_charge = False
 
-        speed_mode = resolve_speedvsdetail(task.parameters if isinstance(task.parameters, dict) else None)
-        is_ping_task = speed_mode == SpeedVsDetailEnum.PING_LLM
+    speed_mode = resolve_speedvsdetail(task.parameters if isinstance(task.parameters, dict) else None)
+    is_ping_task = speed_mode == SpeedVsDetailEnum.PING_LLM
 
-        if success and should_charge and not is_ping_task:
-            success_fee_usd = float(os.environ.get("PLANEXE_SUCCESS_PLAN_FEE_USD", "1.0"))
+    if success and should_charge and not is_ping_task:
+        success_fee_usd = SUCCESS_PLAN_FEE_USD
 
-        total_charge_usd = usage_cost_usd + success_fee_usd
-        charged_credits = _credits_for_usd(total_charge_usd) if should_charge else Decimal("0")
+    total_charge_usd = usage_cost_usd + success_fee_usd
+    charged_credits = _credits_for_usd(total_charge_usd) if should_charge else Decimal("0")
 
-        existing = CreditHistory.query.filter_by(
+    existing = CreditHistory.query.filter_by(
+        source="usage_billing",
+        external_id=str(task.id),
+    ).first()
+    if existing is not None:
+        return _billing_result(usage_cost_usd, success_fee_usd, total_charge_usd, Decimal("0"), False)
+
+    if user is not None and charged_credits > 0:
+        current_balance = Decimal(str(user.credits_balance or 0)).quantize(CREDIT_SCALE)
+        user.credits_balance = (current_balance - charged_credits).quantize(CREDIT_SCALE)
+        ledger = CreditHistory(
+            user_id=user.id,
+            delta=-charged_credits,
+            reason="plan_created_with_usage_cost" if success else "plan_failed_usage_cost",
             source="usage_billing",
-            external_id=str(task_id),
-        ).first()
-        if existing is not None:
-            return {
-                "usage_cost_usd": usage_cost_usd,
-                "success_fee_usd": success_fee_usd,
-                "total_charge_usd": total_charge_usd,
-                "charged_credits": Decimal("0"),
-                "charged": False,
-            }
-
-        if user is not None and charged_credits > 0:
-            current_balance = Decimal(str(user.credits_balance or 0)).quantize(CREDIT_SCALE)
-            user.credits_balance = (current_balance - charged_credits).quantize(CREDIT_SCALE)
-            ledger = CreditHistory(
-                user_id=user.id,
-                delta=-charged_credits,
-                reason="plan_created_with_usage_cost" if success else "plan_failed_usage_cost",
-                source="usage_billing",
-                external_id=str(task_id),
-            )
-            db.session.add(ledger)
+            external_id=str(task.id),
+        )
+        db.session.add(ledger)
+        return _billing_result(usage_cost_usd, success_fee_usd, total_charge_usd, charged_credits, True)
+
+    return _billing_result(usage_cost_usd, success_fee_usd, total_charge_usd, Decimal("0"), False)
+
+
+def finish_task_with_retry(
+    task_id: str,
+    new_state: TaskState,
+    run_id_dir: Path,
+    event_type: EventType,
+    event_message: str,
+    event_context: dict[str, str],
+    usage_cost_usd: Optional[float] = None,
+    max_retries: int = 3,
+    retry_delay: int = 5,
+) -> dict[str, float | Decimal | bool]:
+    """
+    Move a task to its final state, bill it, and record the event, in a single transaction.
+
+    The success fee only applies when new_state is completed. Pass usage_cost_usd when it has already been
+    read from the run dir; otherwise it's read here. The billing values are added to event_context.
+    Retries follow update_task_state_with_retry. If every attempt fails, the state is still set on its own,
+    so the task doesn't stay in processing, and the task is left unbilled. The event is then recorded in a
+    transaction of its own, with the unbilled usage cost and a billing_error.
+
+    Returns the billing diagnostics.
+    """
+    if usage_cost_usd is None:
+        usage_cost_usd = _read_inference_cost_usd_from_run_dir(run_id_dir)
+    success = new_state == TaskState.completed
+
+    for attempt in range(max_retries):
+        try:
+            task = db.session.get(TaskItem, task_id, with_for_update=True)
+            if task is None:
+                logger.error(f"Task with ID {task_id!r} not found in database. Cannot update task state or bill it.")
+                billing_result = _billing_result(usage_cost_usd, 0.0, usage_cost_usd, Decimal("0"), False)
+            else:
+                if task.state != new_state:
+                    task.state = new_state
+                billing_result = _charge_usage_credits(task, success=success, usage_cost_usd=usage_cost_usd)
+            event_context.update(_billing_event_fields(billing_result))
+            add_event(event_type, event_message, event_context)
             db.session.commit()
-            return {
-                "usage_cost_usd": usage_cost_usd,
-                "success_fee_usd": success_fee_usd,
-                "total_charge_usd": total_charge_usd,
-                "charged_credits": charged_credits,
-                "charged": True,
-            }
-
-        return {
-            "usage_cost_usd": usage_cost_usd,
-            "success_fee_usd": success_fee_usd,
-            "total_charge_usd": total_charge_usd,
-            "charged_credits": Decimal("0"),
-            "charged": False,
-        }
-
-def upload_report_to_worker_plan(run_id: str, report_path: Path) -> None:
+            logger.info(f"Finished task {task_id!r} with state {new_state}")
+            return billing_result
+        except Exception as e:
+            logger.error(f"Database error finishing task (attempt {attempt + 1}/{max_retries}): {e}", exc_info=True)
+            db.session.rollback()
+            if attempt < max_retries - 1:
+                if _is_transaction_conflict(e):
+                    logger.info("Transaction conflict. Retrying immediately...")
+                    continue
+                logger.info(f"Retrying in {retry_delay} seconds...")
+                time.sleep(retry_delay)
+
+    logger.error(f"Max retries reached while finishing task {task_id!r}. Setting its state without billing. Unbilled usage cost: {usage_cost_usd} USD.")
+    update_task_state_with_retry(task_id, new_state, max_retries=max_retries, retry_delay=retry_delay)
+    billing_result = _billing_result(usage_cost_usd, 0.0, usage_cost_usd, Decimal("0"), False)
+
+    # Still record the terminal event, in its own transaction, so admin and billing views see how the task ended
+    # and what it would have cost.
+    event_context.update(_billing_event_fields(billing_result))
+    event_context["billing_error"] = "Unable to bill the task. The final state was set without billing."
+    try:
+        add_event(event_type, event_message, event_context)
+        db.session.commit()
+    except Exception as e:
+        logger.error(f"Unable to record the {event_type} event for task {task_id!r}: {e}", exc_info=True)
+        db.session.rollback()
+    return billing_result
+
+# Shared HTTP session, so consecutive report uploads to worker_plan reuse pooled keep-alive connections
+# instead of paying a new TCP/TLS handshake per task.
+_http_session = requests.Session()
+_http_session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+_http_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+
+def upload_report_to_worker_plan(run_id: str, report_html: Optional[str]) -> None:
     """
     Best-effort upload of the generated report to the worker_plan service so the frontend can fetch it
     even when worker_plan and worker_plan_database do not share a filesystem (e.g., Railway).
+
+    Takes the report content that was already read for the TaskItem, rather than reading the file a second time.
     """
     worker_plan_url = os.environ.get("PLANEXE_WORKER_PLAN_URL")
     if not worker_plan_url:
         return
 
-    if not report_path.exists():
-        logger.warning("Report path not found for run %s at %s; skipping upload to worker_plan.", run_id, report_path)
+    if not report_html:
+        logger.warning("No report content for run %s; skipping upload to worker_plan.", run_id)
         return
 
     worker_plan_url = worker_plan_url.rstrip("/")
     url = f"{worker_plan_url}/runs/{run_id}/report"
 
     try:
-        report_html = report_path.read_text(encoding="utf-8")
-    except Exception as exc:
-        logger.warning("Unable to read report for run %s: %s", run_id, exc)
-        return
-
-    try:
-        response = requests.post(url, json={"report_html": report_html}, timeout=15)
+        response = _http_session.post(url, json={"report_html": report_html}, timeout=(5, 15))
     except Exception as exc:
         logger.warning("Error uploading report for run %s to worker_plan: %s", run_id, exc)
         return
@@ -553,89 +741,125 @@ def upload_report_to_worker_plan(run_id: str, report_path: Path) -> None:
             response.text[:500],
         )
 
+def task_event_context(task_id: str, user_id: str, run_id_dir: Path, speedvsdetail: SpeedVsDetailEnum, **extra: str) -> dict[str, str]:
+    """The fields shared by every task event's context, followed by the event specific ones."""
+    return {
+        "task_id": task_id,
+        "user_id": user_id,
+        "run_id_dir": str(run_id_dir),
+        "speedvsdetail": str(speedvsdetail),
+        **extra,
+        "WORKER_ID": WORKER_ID,
+    }
+
 def execute_pipeline_for_job(task_id: str, user_id: str, run_id_dir: Path, speedvsdetail: SpeedVsDetailEnum, use_machai_developer_endpoint: bool):
     start_time = time.time()
     logger.info(f"Executing pipeline for task_id: {task_id!r}, run_id_dir: {run_id_dir!r}, speedvsdetail: {speedvsdetail!r}, use_machai_developer_endpoint: {use_machai_developer_endpoint!r}...")
 
-    llm_models = ExecutePipeline.resolve_llm_models(None)
-    pipeline_instance = ServerExecutePipeline(task_id=task_id, run_id_dir=run_id_dir, speedvsdetail=speedvsdetail, llm_models=llm_models)
-    # Keep a Flask app context active while running pipeline tasks so db-backed
+    pipeline_instance = ServerExecutePipeline(task_id=task_id, run_id_dir=run_id_dir, speedvsdetail=speedvsdetail, llm_models=list(LLM_MODELS))
+    # Runs inside the worker loop's app context (see start_task_monitor), so db-backed
     # instrumentation (for example token metrics) can access db.session safely.
-    with app.app_context():
-        set_current_task_id(task_id)
-        set_current_user_id(user_id)
-        previous_track_activity_path = track_activity.jsonl_file_path
-        try:
-            # Always keep activity tracking in the task run directory, including PING_LLM mode.
-            track_activity.jsonl_file_path = run_id_dir / ExtraFilenameEnum.TRACK_ACTIVITY_JSONL.value
-
-            if speedvsdetail == SpeedVsDetailEnum.PING_LLM:
-                logger.info("PING_LLM mode requested; running a single LLM ping.")
-                run_ping_llm_report(
-                    run_id_dir=run_id_dir,
-                    llm_models=LLMModelFromName.from_names(llm_models),
-                )
-            else:
-                pipeline_instance.setup()
-                logger.info(f"ExecutePipeline instance: {pipeline_instance!r}")
+    set_current_task_id(task_id)
+    set_current_user_id(user_id)
+    previous_track_activity_path = track_activity.jsonl_file_path
+    try:
+        # Always keep activity tracking in the task run directory, including PING_LLM mode.
+        track_activity.jsonl_file_path = run_id_dir / ExtraFilenameEnum.TRACK_ACTIVITY_JSONL.value
+
+        if speedvsdetail == SpeedVsDetailEnum.PING_LLM:
+            logger.info("PING_LLM mode requested; running a single LLM ping.")
+            run_ping_llm_report(
+                run_id_dir=run_id_dir,
+                llm_models=list(PING_LLM_MODELS),
+            )
+        else:
+            pipeline_instance.setup()
+            logger.info(f"ExecutePipeline instance: {pipeline_instance!r}")
 
-                pipeline_instance.run()
-        finally:
-            track_activity.jsonl_file_path = previous_track_activity_path
-            set_current_user_id(None)
-            set_current_task_id(None)
+            pipeline_instance.run()
+    finally:
+        track_activity.jsonl_file_path = previous_track_activity_path
+        set_current_user_id(None)
+        set_current_task_id(None)
 
     end_time = time.time()
     duration_in_seconds = end_time - start_time
     logger.info(f"Pipeline for {run_id_dir!r} executed in {duration_in_seconds:.2f} seconds")
 
     # Collect artifacts for storage.
+    # Reading the report, zipping the run dir, and reading the inference cost are independent and mostly I/O,
+    # so they run concurrently. The completion then takes about as long as the zip alone.
     report_path = run_id_dir / FilenameEnum.REPORT.value
-    report_html: Optional[str] = None
-    if pipeline_instance.has_report_file and report_path.exists():
+
+    def read_report_html() -> Optional[str]:
+        if not (pipeline_instance.has_report_file and report_path.exists()):
+            return None
         try:
-            report_html = report_path.read_text(encoding='utf-8')
+            return report_path.read_text(encoding='utf-8')
         except Exception as exc:
             logger.warning("Unable to read report for task %s: %s", task_id, exc)
+            return None
 
+    with ThreadPoolExecutor(max_workers=3, thread_name_prefix="artifacts") as executor:
+        report_html_future = executor.submit(read_report_html)
+        run_zip_future = executor.submit(create_zip_bytes, run_id_dir)
+        usage_cost_future = executor.submit(_read_inference_cost_usd_from_run_dir, run_id_dir)
+
+    report_html = report_html_future.result()
+    usage_cost_usd = usage_cost_future.result()
+
+    # The zip walk also counts the files in the run_id_dir, so the directory is only listed once.
     run_zip_bytes: Optional[bytes] = None
     try:
-        run_zip_bytes = create_zip_bytes(run_id_dir)
+        run_zip_bytes, number_of_files_in_run_id_dir = run_zip_future.result()
     except Exception as exc:
         logger.warning("Unable to create zip snapshot for task %s: %s", task_id, exc)
-
-    # count number of files in the run_id_dir
-    number_of_files_in_run_id_dir: int = len([f for f in run_id_dir.iterdir() if f.is_file()])
-
-    event_context = {
-        "task_id": str(task_id), 
-        "user_id": str(user_id), 
-        "run_id_dir": str(run_id_dir), 
-        "speedvsdetail": str(speedvsdetail), 
-        "duration_between_processing_and_completion": str(duration_in_seconds),
-        "has_report_file": str(pipeline_instance.has_report_file),
-        "has_stop_flag_file": str(pipeline_instance.has_stop_flag_file),
-        "has_pipeline_complete_file": str(pipeline_instance.has_pipeline_complete_file),
-        "luigi_build_return_value": str(pipeline_instance.luigi_build_return_value),
-        "number_of_files_in_run_id_dir": str(number_of_files_in_run_id_dir),
-        "WORKER_ID": str(WORKER_ID)
-    }
+        number_of_files_in_run_id_dir = len([f for f in run_id_dir.iterdir() if f.is_file()])
+
+    event_context = task_event_context(
+        task_id, user_id, run_id_dir, speedvsdetail,
+        duration_between_processing_and_completion=str(duration_in_seconds),
+        has_report_file=str(pipeline_instance.has_report_file),
+        has_stop_flag_file=str(pipeline_instance.has_stop_flag_file),
+        has_pipeline_complete_file=str(pipeline_instance.has_pipeline_complete_file),
+        luigi_build_return_value=str(pipeline_instance.luigi_build_return_value),
+        number_of_files_in_run_id_dir=str(number_of_files_in_run_id_dir),
+    )
 
     # Persist artifacts to the TaskItem record.
+    # A single UPDATE ... RETURNING, bypassing the ORM. Loading the row via the ORM would first fetch the
+    # existing report/zip columns, and then go through the unit of work just to write two columns.
     stop_requested = False
-    with app.app_context():
-        task = db.session.get(TaskItem, task_id)
-        if task is None:
-            logger.error("Task %s not found while attempting to store report/zip.", task_id)
-        else:
-            stop_requested = bool(task.stop_requested)
-            task.generated_report_html = report_html if pipeline_instance.has_report_file else None
-            task.run_zip_snapshot = run_zip_bytes
-            try:
-                db.session.commit()
-            except Exception as exc:
-                logger.error("Failed to store report/zip for task %s: %s", task_id, exc, exc_info=True)
-                db.session.rollback()
+    store_artifacts = (
+        update(TaskItem)
+        .where(TaskItem.id == task_id)
+        .values(
+            generated_report_html=report_html if pipeline_instance.has_report_file else None,
+            run_zip_snapshot=run_zip_bytes,
+        )
+        .returning(TaskItem.stop_requested)
+        .execution_options(synchronize_session=False)
+    )
+    stop_requested_lookup_failed = False
+    try:
+        row = db.session.execute(store_artifacts).first()
+        db.session.commit()
+    except Exception as exc:
+        logger.error("Failed to store report/zip for task %s: %s", task_id, exc, exc_info=True)
+        db.session.rollback()
+        # A failed artifact store must not fail the task. Still try to read stop_requested, but if the database
+        # is having trouble, assume no stop was requested.
+        try:
+            row = db.session.execute(select(TaskItem.stop_requested).where(TaskItem.id == task_id)).first()
+        except Exception as select_exc:
+            logger.error("Failed to read stop_requested for task %s: %s", task_id, select_exc, exc_info=True)
+            db.session.rollback()
+            row = None
+            stop_requested_lookup_failed = True
+    if row is not None:
+        stop_requested = bool(row.stop_requested)
+    elif not stop_requested_lookup_failed:
+        logger.error("Task %s not found while attempting to store report/zip.", task_id)
 
     event_context["stop_requested"] = str(stop_requested)
 
@@ -652,139 +876,213 @@ def execute_pipeline_for_job(task_id: str, user_id: str, run_id_dir: Path, speed
         machai_error_message = 'Error. Unable to generate the report. Likely reasons: censorship, restricted content.'
 
     # Update the TaskItem state to completed or failed
-    with app.app_context():
-        if pipeline_instance.has_report_file:
-            update_task_state_with_retry(task_id, TaskState.completed)
-            billing_result = _charge_usage_credits_once(task_id=task_id, run_id_dir=run_id_dir, success=True)
-            event_context.update({
-                "billing_usage_cost_usd": str(billing_result["usage_cost_usd"]),
-                "billing_success_fee_usd": str(billing_result["success_fee_usd"]),
-                "billing_total_charge_usd": str(billing_result["total_charge_usd"]),
-                "billing_charged_credits": str(billing_result["charged_credits"]),
-                "billing_charge_applied": str(billing_result["charged"]),
-            })
-            event = EventItem(
-                event_type=EventType.TASK_COMPLETED,
-                message=f"Processing -> Completed",
-                context=event_context
-            )
-            db.session.add(event)
-            db.session.commit()
-        else:
-            update_task_state_with_retry(task_id, TaskState.failed)
-            billing_result = _charge_usage_credits_once(task_id=task_id, run_id_dir=run_id_dir, success=False)
-            event_context["machai_error_message"] = machai_error_message
-            event_context.update({
-                "billing_usage_cost_usd": str(billing_result["usage_cost_usd"]),
-                "billing_success_fee_usd": str(billing_result["success_fee_usd"]),
-                "billing_total_charge_usd": str(billing_result["total_charge_usd"]),
-                "billing_charged_credits": str(billing_result["charged_credits"]),
-                "billing_charge_applied": str(billing_result["charged"]),
-            })
-            event = EventItem(
-                event_type=EventType.TASK_FAILED,
-                message=f"Processing -> Failed",
-                context=event_context
-            )
-            db.session.add(event)
-            db.session.commit()
+    # The final state, the billing, and the event are committed together.
+    if pipeline_instance.has_report_file:
+        finish_task_with_retry(
+            task_id,
+            TaskState.completed,
+            run_id_dir=run_id_dir,
+            event_type=EventType.TASK_COMPLETED,
+            event_message=f"Processing -> Completed",
+            event_context=event_context,
+            usage_cost_usd=usage_cost_usd,
+        )
+    else:
+        event_context["machai_error_message"] = machai_error_message
+        finish_task_with_retry(
+            task_id,
+            TaskState.failed,
+            run_id_dir=run_id_dir,
+            event_type=EventType.TASK_FAILED,
+            event_message=f"Processing -> Failed",
+            event_context=event_context,
+            usage_cost_usd=usage_cost_usd,
+        )
 
     # Post confirmation to MachAI
     machai_instance: MachAI = MachAI.create(use_machai_developer_endpoint=use_machai_developer_endpoint)
     if pipeline_instance.has_report_file:
-        plan_name = 'Unnamed Plan'
         title_path = run_id_dir / FilenameEnum.WBS_LEVEL1_PROJECT_TITLE.value
-        if title_path.is_file():
+        try:
             plan_name = title_path.read_text(encoding='utf-8').strip()
             logger.debug(f"WBS_LEVEL1_PROJECT_TITLE file found at {title_path!r}. Using the plan_name: {plan_name!r}.")
-        else:
+        except (FileNotFoundError, IsADirectoryError):
+            plan_name = 'Unnamed Plan'
             logger.warning(f"WBS_LEVEL1_PROJECT_TITLE file not found at {title_path!r}. Using the default plan_name: {plan_name!r}.")
-        machai_instance.post_confirmation_ok_with_file(session_id=user_id, path=run_id_dir / FilenameEnum.REPORT.value, plan_name=plan_name)
-        upload_report_to_worker_plan(run_id=str(task_id), report_path=run_id_dir / FilenameEnum.REPORT.value)
+        # Reuse the report that was read for the TaskItem, rather than reading the file again.
+        if report_html is not None:
+            machai_instance.post_confirmation_ok(session_id=user_id, content=report_html, plan_name=plan_name)
+        else:
+            machai_instance.post_confirmation_ok_with_file(session_id=user_id, path=run_id_dir / FilenameEnum.REPORT.value, plan_name=plan_name)
+        upload_report_to_worker_plan(run_id=str(task_id), report_html=report_html)
     else:
         machai_instance.post_confirmation_error(session_id=user_id, message=str(machai_error_message))
 
-def process_pending_tasks() -> bool:
+# How tasks are claimed: "skip_locked" (SELECT ... FOR UPDATE SKIP LOCKED inside the claiming UPDATE), or "atomic_update"
+# (a plain conditional UPDATE, for distributed SQL such as CockroachDB, where SKIP LOCKED is slow or unreliable).
+# Unset picks by database dialect.
+TASK_CLAIM_STRATEGIES = ("skip_locked", "atomic_update")
+
+@lru_cache(maxsize=None)
+def task_claim_uses_skip_locked(dialect_name: str) -> bool:
+    strategy = os.environ.get(DotEnvKeyEnum.PLANEXE_TASK_CLAIM_STRATEGY.value)
+    if strategy and strategy not in TASK_CLAIM_STRATEGIES:
+        logger.warning(f"Invalid PLANEXE_TASK_CLAIM_STRATEGY={strategy!r}; expected one of {TASK_CLAIM_STRATEGIES}. Choosing by dialect.")
+        strategy = None
+    if not strategy:
+        strategy = "skip_locked" if dialect_name in ("postgresql", "mysql", "sqlite") else "atomic_update"
+    logger.info(f"Task claim strategy: {strategy!r} (dialect: {dialect_name!r})")
+    return strategy == "skip_locked"
+
+# Deleting a run dir can take thousands of unlink syscalls for a detailed plan. The worker renames the dir
+# into a ".trash" dir next to it (same filesystem, so the rename is atomic), and a background thread deletes it.
+RUN_DIR_TRASH_NAME = ".trash"
+_run_dir_cleanup_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="run-cleanup")
+
+def _rmtree_logged(path: Path) -> None:
+    try:
+        shutil.rmtree(path)
+        logger.debug(f"Deleted trashed run dir: {path!r}")
+    except FileNotFoundError:
+        # Another worker reaping the same trash dir got to it first.
+        pass
+    except Exception as e:
+        logger.warning(f"Failed to delete trashed run dir {path!r}: {e}")
+
+def discard_run_dir(run_id_dir: Path) -> None:
+    """Move the run_id_dir out of the way, and delete it in the background. Falls back to deleting it right away."""
+    trash_dir = run_id_dir.parent / RUN_DIR_TRASH_NAME
+    try:
+        trash_dir.mkdir(exist_ok=True)
+        trashed_path = trash_dir / uuid.uuid4().hex
+        run_id_dir.rename(trashed_path)
+    except OSError as e:
+        logger.warning(f"Unable to move run_id_dir {run_id_dir!r} to {trash_dir!r}, deleting it in place: {e}")
+        shutil.rmtree(run_id_dir)
+        return
+    _run_dir_cleanup_pool.submit(_rmtree_logged, trashed_path)
+
+def reap_trashed_run_dirs() -> None:
+    """
+    Delete anything left in the trash dirs, e.g. when the worker exited before the background deletes finished.
+
+    Several workers share the trash dirs, so each entry is first claimed by renaming it to "<entry>.<worker_id>".
+    Only one worker's rename succeeds. Entries claimed by another worker are left to that worker.
+    """
+    for base_dir in (BASE_DIR_RUN, FAST_RUN_DIR):
+        if base_dir is None:
+            continue
+        trash_dir = base_dir / RUN_DIR_TRASH_NAME
+        if not trash_dir.is_dir():
+            continue
+        for trashed_path in trash_dir.iterdir():
+            entry_name, _, claimed_by = trashed_path.name.partition(".")
+            if claimed_by:
+                # Claimed by an earlier run of this worker, which exited before deleting it.
+                if claimed_by == sanitized_worker_id:
+                    _run_dir_cleanup_pool.submit(_rmtree_logged, trashed_path)
+                continue
+            claimed_path = trash_dir / f"{entry_name}.{sanitized_worker_id}"
+            try:
+                trashed_path.rename(claimed_path)
+            except FileNotFoundError:
+                # Claimed, or deleted, by another worker.
+                continue
+            except OSError as e:
+                logger.warning(f"Unable to claim trashed run dir {trashed_path!r}: {e}")
+                continue
+            _run_dir_cleanup_pool.submit(_rmtree_logged, claimed_path)
+
+def run_dir_for_task(task_id: str, speedvsdetail: SpeedVsDetailEnum) -> Path:
+    """Fast runs go to PLANEXE_FAST_RUN_DIR when it's configured; everything else to PLANEXE_RUN_DIR."""
+    if FAST_RUN_DIR is not None and speedvsdetail == SpeedVsDetailEnum.FAST_BUT_SKIP_DETAILS:
+        return FAST_RUN_DIR / task_id
+    return BASE_DIR_RUN / task_id
+
+def process_pending_tasks() -> int:
     """
     Attempts to claim and process one pending task.
+    Must be called inside an app context; the worker loop keeps one pushed for its lifetime.
 
     Pick up the oldest pending task from the FIFO queue and process it.
+    Returns the number of tasks processed: 1 whenever a task was claimed, whether it completed or failed,
+    so the caller claims the next one right away. 0 when there was nothing to claim or the claim failed,
+    so the caller waits for a pending-task notification.
     """
     task_id: Optional[str] = None
     prompt: Optional[str] = None
+    claimed_at: Optional[datetime] = None
     parameters = None
     use_machai_developer_endpoint: bool = False
     user_id: Optional[str] = None
     timestamp_created: Optional[datetime] = None
     speedvsdetail: SpeedVsDetailEnum = SpeedVsDetailEnum.ALL_DETAILS_BUT_SLOW
+    duration_between_pending_and_processing: float = 0.0
 
-    with app.app_context():
-        try:
-            # Use a nested transaction for the claiming part.
-            # This ensures that if the claim fails (e.g. row lock), we can rollback just the claim part.
-            with db.session.begin_nested():
-                # Atomically find and claim a task
-                # Filter for pending tasks not yet assigned a worker_id
-                # Order by creation time to ensure FIFO processing
-                # `with_for_update(skip_locked=True)` is crucial for multi-worker
-                # It tells the DB to lock the selected row and if it's already locked by another transaction,
-                # skip it and try the next one, instead of waiting.
-                task_to_claim = db.session.query(TaskItem)\
-                    .filter(TaskItem.state == TaskState.pending)\
-                    .filter(or_(TaskItem.stop_requested.is_(False), TaskItem.stop_requested.is_(None)))\
-                    .order_by(TaskItem.timestamp_created.asc())\
-                    .with_for_update(skip_locked=True)\
-                    .first()
-
-                if task_to_claim is None:
-                    # No task available or all available tasks were locked by other workers
-                    db.session.rollback() # Rollback (no changes made if no task found)
-                    # logger.debug(f"No claimable pending tasks found.")
-                    return False # No task claimed, sleep for a long time to avoid busy-waiting.
-
-                # Extract all necessary data from task_to_claim BEFORE it's modified and transaction is committed
-                task_id = str(task_to_claim.id)
-                prompt = str(task_to_claim.prompt)
-                parameters = task_to_claim.parameters if isinstance(task_to_claim.parameters, dict) else None
-                speedvsdetail = resolve_speedvsdetail(parameters)
-                use_machai_developer_endpoint = bool(task_to_claim.has_parameter_key('developer'))
-                user_id = str(task_to_claim.user_id)
-                timestamp_created = task_to_claim.timestamp_created
-        
-                # Now, modify the task state
-                task_to_claim.state = TaskState.processing
-                task_to_claim.progress_message = "Picked up by server"
-                task_to_claim.progress_percentage = 0.0
+    try:
+        # Atomically find and claim the oldest pending task, in one UPDATE ... RETURNING round-trip.
+        # FOR UPDATE SKIP LOCKED is crucial for multi-worker: a row that another worker is claiming
+        # is skipped, instead of waiting for it. See task_claim_uses_skip_locked() for databases without it.
+        # Only one task is claimed, since this worker runs one pipeline at a time. Claiming more
+        # would hold them in "processing" while they wait, where idle workers can't pick them up.
+        claimed_rows = TaskItem.claim_pending_batch(limit=1, skip_locked=task_claim_uses_skip_locked(db.engine.dialect.name))
+
+        if not claimed_rows:
+            # No task available or all available tasks were locked by other workers
+            db.session.rollback() # Rollback (no changes made if no task found)
+            # logger.debug(f"No claimable pending tasks found.")
+            return 0 # No task claimed, sleep for a long time to avoid busy-waiting.
+
+        claimed_row = claimed_rows[0]
+        task_id = str(claimed_row.id)
+        prompt = str(claimed_row.prompt)
+        parameters = claimed_row.parameters if isinstance(claimed_row.parameters, dict) else None
+        speedvsdetail = resolve_speedvsdetail(parameters)
+        use_machai_developer_endpoint = parameters is not None and 'developer' in parameters
+        user_id = str(claimed_row.user_id)
+        timestamp_created = claimed_row.timestamp_created
+
+        # Measure how long it took to pick up the task.
+        # The claim time is also the task's start time, so the clock is read once per task.
+        # timestamp_created is naive UTC on databases whose column has no time zone (e.g. existing Postgres tables, SQLite).
+        claimed_at = datetime.now(UTC)
+        timestamp = timestamp_created
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=UTC)
+        duration_between_pending_and_processing = (claimed_at - timestamp).total_seconds()
+
+        # Record the "Pending -> Processing" event in the same transaction as the claim,
+        # so it costs no commit of its own.
+        event_context = task_event_context(
+            task_id, user_id, run_dir_for_task(task_id, speedvsdetail), speedvsdetail,
+            duration_between_pending_and_processing=str(duration_between_pending_and_processing),
+        )
+        add_event(EventType.TASK_PROCESSING, "Pending -> Processing", event_context)
 
-                # Important: commit this nested transaction immediately to release the lock
-                # and make the claim permanent.
-                db.session.commit() 
+        # Commit immediately to release the lock and make the claim permanent.
+        # The claim is a single statement, so it needs no savepoint of its own: on failure the
+        # whole transaction is rolled back below.
+        db.session.commit() 
 
-        except Exception as e:
-            db.session.rollback() # Rollback any potential changes from a failed claim attempt
-            logger.error(f"DB error during task claiming: {e}", exc_info=True)
-            return False # Error, sleep longer
+    except Exception as e:
+        db.session.rollback() # Rollback any potential changes from a failed claim attempt
+        logger.error(f"DB error during task claiming: {e}", exc_info=True)
+        return 0 # Error, sleep longer
 
 
     logger.info(f"Successfully claimed task: {task_id!r}, user_id: {user_id!r}, timestamp_created: {timestamp_created!r}, use_machai_developer_endpoint: {use_machai_developer_endpoint!r}")
 
-    with app.app_context():
-        WorkerItem.upsert_heartbeat(worker_id=WORKER_ID, current_task_id=task_id)
+    upsert_worker_heartbeat(current_task_id=task_id, force=True)
         
-    # Measure how long it took to pick up the task
-    timestamp = timestamp_created
-    if timestamp.tzinfo is None:
-        timestamp = timestamp.replace(tzinfo=UTC)
-    duration_between_pending_and_processing = (datetime.now(UTC) - timestamp).total_seconds()
     logger.debug(f"Duration between pending and processing: {duration_between_pending_and_processing} seconds")
 
     # Create a run_id_dir for the task
-    run_id_dir = BASE_DIR_RUN / task_id
+    run_id_dir = run_dir_for_task(task_id, speedvsdetail)
     logger.debug(f"creating run_id_dir: {run_id_dir!r}")
     run_id_dir.mkdir(parents=True, exist_ok=True)
 
     # write the start time to the run_id_dir
-    start_time: datetime = datetime.now().astimezone()
+    start_time: datetime = claimed_at.astimezone()
     start_time_file = StartTime.create(local_time=start_time)
     start_time_file.save(str(run_id_dir / FilenameEnum.START_TIME.value))
 
@@ -792,70 +1090,47 @@ def process_pending_tasks() -> bool:
     plan_file = PlanFile.create(vague_plan_description=prompt, start_time=start_time)
     plan_file.save(str(run_id_dir / FilenameEnum.INITIAL_PLAN.value))
 
-    with app.app_context():
-        event_context = {
-            "task_id": str(task_id), 
-            "user_id": str(user_id), 
-            "run_id_dir": str(run_id_dir), 
-            "speedvsdetail": str(speedvsdetail), 
-            "duration_between_pending_and_processing": str(duration_between_pending_and_processing),
-            "WORKER_ID": str(WORKER_ID)
-        }
-        event = EventItem(
-            event_type=EventType.TASK_PROCESSING,
-            message=f"Pending -> Processing",
-            context=event_context
-        )
-        db.session.add(event)
-        db.session.commit()
-
     try:
         # Create run directory and execute pipeline
         execute_pipeline_for_job(task_id=task_id, user_id=user_id, run_id_dir=run_id_dir, speedvsdetail=speedvsdetail, use_machai_developer_endpoint=use_machai_developer_endpoint)
-        with app.app_context():
-            WorkerItem.upsert_heartbeat(worker_id=WORKER_ID)
-        return True # We just processed a task. There may be more pending tasks, don't sleep that long, so we can process the next task.
+        upsert_worker_heartbeat()
+        return 1 # We just processed a task. There may be more pending tasks, don't sleep, so we can process the next task.
         
     except Exception as e:
         logger.error(f"Error processing task {task_id!r}: {e}", exc_info=True)
-        # Update task state to failed
-        with app.app_context():
-            update_task_state_with_retry(task_id, TaskState.failed)
-        billing_result = _charge_usage_credits_once(task_id=task_id, run_id_dir=run_id_dir, success=False)
         machai_error_message = 'Unknown error happened while processing.'
+        # The session is shared with the failed pipeline run, and may be left mid-transaction.
+        db.session.rollback()
+        # Update task state to failed, bill, and record the event in one transaction.
+        event_context = task_event_context(
+            task_id, user_id, run_id_dir, speedvsdetail,
+            duration_between_pending_and_processing=str(duration_between_pending_and_processing),
+            machai_error_message=machai_error_message,
+        )
+        finish_task_with_retry(
+            task_id,
+            TaskState.failed,
+            run_id_dir=run_id_dir,
+            event_type=EventType.TASK_FAILED,
+            event_message=f"Processing -> Failed",
+            event_context=event_context,
+        )
+        upsert_worker_heartbeat()
         machai_instance: MachAI = MachAI.create(use_machai_developer_endpoint=use_machai_developer_endpoint)
         machai_instance.post_confirmation_error(session_id=user_id, message=machai_error_message)
-        with app.app_context():
-            event_context = {
-                "task_id": str(task_id), 
-                "user_id": str(user_id), 
-                "run_id_dir": str(run_id_dir), 
-                "speedvsdetail": str(speedvsdetail), 
-                "duration_between_pending_and_processing": str(duration_between_pending_and_processing),
-                "WORKER_ID": str(WORKER_ID),
-                "machai_error_message": str(machai_error_message),
-                "billing_usage_cost_usd": str(billing_result["usage_cost_usd"]),
-                "billing_success_fee_usd": str(billing_result["success_fee_usd"]),
-                "billing_total_charge_usd": str(billing_result["total_charge_usd"]),
-                "billing_charged_credits": str(billing_result["charged_credits"]),
-                "billing_charge_applied": str(billing_result["charged"]),
-            }
-            event = EventItem(
-                event_type=EventType.TASK_FAILED,
-                message=f"Processing -> Failed",
-                context=event_context
-            )
-            db.session.add(event)
-            db.session.commit()
-        with app.app_context():
-            WorkerItem.upsert_heartbeat(worker_id=WORKER_ID)
-        return False # We didn't process a task. Sleep for a long time to avoid busy-waiting.
+        # The task was claimed and is now failed, so it can't be claimed again. Other pending tasks
+        # are still waiting, and their notifications were already drained, so don't back off.
+        return 1
     finally:
+        # The app context outlives the task, so drop the session here. Otherwise the identity map
+        # would keep this task's rows (including the report and zip) alive until the next task.
+        db.session.remove()
         # Clean up the run_id_dir after the pipeline has completed and data is stored in the database.
         # This prevents the "run" directory from accumulating old session data.
+        # The delete itself happens in the background, so the next task can be claimed right away.
         if run_id_dir.exists():
             try:
-                shutil.rmtree(run_id_dir)
+                discard_run_dir(run_id_dir)
                 logger.info(f"Cleaned up run_id_dir: {run_id_dir!r}")
             except Exception as cleanup_error:
                 logger.warning(f"Failed to clean up run_id_dir {run_id_dir!r}: {cleanup_error}")
@@ -864,11 +1139,15 @@ def startup_worker():
     with app.app_context():
         try:
             db.create_all()
-            ensure_taskitem_artifact_columns()
-            ensure_token_metrics_columns()
-            ensure_fractional_credit_columns()
+            ensure_schema()
             logger.debug(f"Ensured database tables exist.")
-            WorkerItem.upsert_heartbeat(worker_id=WORKER_ID)
+            try:
+                ensure_task_pending_notify_trigger(db.engine)
+            except Exception as e:
+                # Without the trigger, pending tasks are still picked up by the fallback polling.
+                logger.warning(f"Unable to create the pending task notify trigger: {e}", exc_info=True)
+            upsert_worker_heartbeat()
+            reap_trashed_run_dirs()
         except Exception as e:    
             logger.critical(f"Error during startup: {e}", exc_info=True)
             raise e
@@ -876,26 +1155,40 @@ def startup_worker():
 def start_task_monitor():
     """Start monitoring the database for pending tasks."""
     logger.info("Started monitoring database for pending tasks.")
+    # One app context for the whole loop, rather than pushing and popping one per database access.
+    # Each task removes its session when it's done, so state doesn't leak from one task to the next.
+    # Threads don't inherit the app context; the artifact threads in execute_pipeline_for_job don't touch the db.
+    app_context = app.app_context()
+    app_context.push()
+    task_pending_listener = TaskPendingListener(db.engine, fallback_poll_interval=PENDING_TASK_POLL_INTERVAL_WITHOUT_NOTIFY_IN_SECONDS)
     try:
         last_heartbeat_time = time.time()
         while True:
-            processed_something = process_pending_tasks()
-            time.sleep(1 if processed_something else 5)
+            number_of_processed_tasks = process_pending_tasks()
+            if number_of_processed_tasks > 0:
+                # Drain the queue: more tasks may be pending, so claim the next one right away,
+                # without waiting or a separate heartbeat. process_pending_tasks wrote one after the task.
+                last_heartbeat_time = time.time()
+                continue
+
+            # Block until a task becomes pending, instead of sleeping a fixed interval.
+            # Wake up no later than the next heartbeat is due, so an idle worker still reports in on time.
+            seconds_until_heartbeat = last_heartbeat_time + HEARTBEAT_INTERVAL_IN_SECONDS - time.time()
+            wait_timeout = max(1.0, min(PENDING_TASK_POLL_INTERVAL_IN_SECONDS, seconds_until_heartbeat))
+            task_pending_listener.wait(wait_timeout)
             
             # Wait N seconds between heartbeats, so the database doesn't get hammered with heartbeat updates. 
             new_heatbeat_time = time.time()
-            if processed_something:
-                # no need to update the last_heartbeat_time if we just processed a task
-                last_heartbeat_time = new_heatbeat_time
-            if new_heatbeat_time - last_heartbeat_time > HEARTBEAT_INTERVAL_IN_SECONDS:
+            if new_heatbeat_time - last_heartbeat_time >= HEARTBEAT_INTERVAL_IN_SECONDS:
                 last_heartbeat_time = new_heatbeat_time
-                with app.app_context():
-                    WorkerItem.upsert_heartbeat(worker_id=WORKER_ID)
+                upsert_worker_heartbeat()
     except KeyboardInterrupt:
         logger.info("KeyboardInterrupt received. Stopping task monitor...")
     except Exception as e:
         logger.critical(f"Unhandled exception in task monitor: {e}", exc_info=True)
     finally:
+        task_pending_listener.close()
+        app_context.pop()
         logger.info("Task monitor shut down.")
         logging.shutdown()
 
@@ -6,6 +6,7 @@ PROMPT> python -m machai
 import logging
 import os
 from pathlib import Path
+from typing import Optional
 import requests
 import traceback
 from enum import Enum
@@ -33,6 +34,13 @@ CONFIRMATION_URL_PRODUCTION = _require_confirmation_url(ENV_VAR_PLANEXE_IFRAME_G
 CONFIRMATION_URL_DEVELOPMENT = _require_confirmation_url(ENV_VAR_PLANEXE_IFRAME_GENERATOR_CONFIRMATION_DEVELOPMENT)
 
 
+# Shared by all MachAI instances, so confirmations reuse keep-alive connections instead of a new TLS handshake per task.
+_http_session = requests.Session()
+
+# MachAI instances by use_machai_developer_endpoint, filled in by MachAI.create.
+_instances: dict[bool, "MachAI"] = {}
+
+
 class ConfirmationStatus(str, Enum):
     # The report has been generated successfully.
     ok = 'ok'
@@ -46,9 +54,15 @@ class MachAI:
 
     @classmethod
     def create(cls, use_machai_developer_endpoint: bool) -> 'MachAI':
-        if use_machai_developer_endpoint:
-            return cls(url=CONFIRMATION_URL_DEVELOPMENT, url_mode='developer')
-        return cls(url=CONFIRMATION_URL_PRODUCTION, url_mode='production')
+        """Return the client for the endpoint. There is one instance per endpoint, since a client only holds its url."""
+        instance = _instances.get(use_machai_developer_endpoint)
+        if instance is None:
+            if use_machai_developer_endpoint:
+                instance = cls(url=CONFIRMATION_URL_DEVELOPMENT, url_mode='developer')
+            else:
+                instance = cls(url=CONFIRMATION_URL_PRODUCTION, url_mode='production')
+            _instances[use_machai_developer_endpoint] = instance
+        return instance
 
     def inner_post_confirmation(self, session_id: str, status: ConfirmationStatus, message: str, plan_name: str, output: str) -> bool:
         """Make a POST request to confirm that the report has been generated or failed."""
@@ -66,7 +80,7 @@ class MachAI:
         
         try:
             # Make the POST request
-            response = requests.post(self.url, json=data, timeout=30)
+            response = _http_session.post(self.url, json=data, timeout=30)
             response.raise_for_status()  # Raise an exception for bad status codes
             
             logger.debug(f"MachAI.post_confirmation, success. Response status: {response.status_code}")
@@ -84,7 +98,13 @@ class MachAI:
             content = file.read()
         
         file_size_in_bytes = path.stat().st_size
-        message = f'Report size is {file_size_in_bytes} bytes.'
+        return self.post_confirmation_ok(session_id=session_id, content=content, plan_name=plan_name, size_in_bytes=file_size_in_bytes)
+
+    def post_confirmation_ok(self, session_id: str, content: str, plan_name: str, size_in_bytes: Optional[int] = None) -> bool:
+        """Make a POST request with an already loaded report, to confirm that the report has been generated."""
+        if size_in_bytes is None:
+            size_in_bytes = len(content.encode('utf-8'))
+        message = f'Report size is {size_in_bytes} bytes.'
 
         return self.inner_post_confirmation(
             session_id=session_id, 
@@ -103,7 +123,7 @@ class MachAI:
             plan_name='',
             output=''
         )
-    
+
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.DEBUG)
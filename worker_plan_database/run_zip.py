@@ -0,0 +1,62 @@
+"""
+Zip snapshot of a run directory, stored in TaskItem.run_zip_snapshot.
+"""
+import io
+import os
+import time
+import zipfile
+from pathlib import Path
+from typing import Tuple
+
+# The snapshot is written once and rarely downloaded. zlib level 1 is several times faster than the default level 6,
+# for a slightly larger archive. It must stay a plain zip, since the frontends and MCP serve it as-is.
+ZIP_COMPRESSLEVEL = 1
+
+# Files up to this size are read in one go and added with writestr(). Larger files go through ZipFile.write(),
+# which streams them in chunks instead of holding the whole file in memory.
+ZIP_WRITESTR_MAX_BYTES = 1024 * 1024
+
+
+def create_zip_bytes(run_dir: Path) -> Tuple[bytes, int]:
+    """
+    Create an in-memory zip of a run directory (skipping log.txt).
+
+    Returns the zip bytes, and the number of files directly inside run_dir (log.txt included, subdirectories not),
+    counted during the same walk so the caller doesn't have to list the directory again.
+    """
+    # Walk with os.scandir on plain strings. The file type comes from the directory listing,
+    # and no Path objects are created per file, which adds up for runs with many small files.
+    run_dir_str = os.fspath(run_dir)
+    prefix_length = len(os.path.join(run_dir_str, ""))
+    top_level_file_count = 0
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED, compresslevel=ZIP_COMPRESSLEVEL) as zipf:
+        stack = [run_dir_str]
+        while stack:
+            dir_path = stack.pop()
+            is_top_level = dir_path == run_dir_str
+            with os.scandir(dir_path) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        # Like os.walk, don't descend into symlinked directories.
+                        if not entry.is_symlink():
+                            stack.append(entry.path)
+                        continue
+                    if is_top_level and entry.is_file():
+                        top_level_file_count += 1
+                    if entry.name == "log.txt":
+                        continue
+                    arcname = entry.path[prefix_length:]
+                    st = entry.stat()
+                    if st.st_size > ZIP_WRITESTR_MAX_BYTES:
+                        zipf.write(entry.path, arcname)
+                        continue
+                    # Build the ZipInfo from the stat result we already have, like ZipInfo.from_file() does,
+                    # so ZipFile.write() doesn't stat the file again.
+                    zinfo = zipfile.ZipInfo(arcname, date_time=time.localtime(st.st_mtime)[:6])
+                    zinfo.external_attr = (st.st_mode & 0xFFFF) << 16
+                    with open(entry.path, "rb") as f:
+                        data = f.read()
+                    zipf.writestr(zinfo, data, compress_type=zipfile.ZIP_DEFLATED, compresslevel=ZIP_COMPRESSLEVEL)
+    # getvalue() hands out the buffer's bytes without the extra full copy that seek(0) + read() makes.
+    return buffer.getvalue(), top_level_file_count
@@ -5,6 +5,8 @@ from worker_plan_internal.plan.speedvsdetail import SpeedVsDetailEnum
 
 logger = logging.getLogger(__name__)
 
+_SPEEDVSDETAIL_BY_VALUE: dict[str, SpeedVsDetailEnum] = {e.value: e for e in SpeedVsDetailEnum}
+
 
 def resolve_speedvsdetail(parameters: Optional[dict[str, Any]]) -> SpeedVsDetailEnum:
     speed_vs_detail_value: Optional[str] = None
@@ -12,9 +14,9 @@ def resolve_speedvsdetail(parameters: Optional[dict[str, Any]]) -> SpeedVsDetail
         speed_vs_detail_value = parameters.get("speed_vs_detail") or parameters.get("speedvsdetail")
 
     if isinstance(speed_vs_detail_value, str) and speed_vs_detail_value:
-        for enum_value in SpeedVsDetailEnum:
-            if enum_value.value == speed_vs_detail_value:
-                return enum_value
+        enum_value = _SPEEDVSDETAIL_BY_VALUE.get(speed_vs_detail_value)
+        if enum_value is not None:
+            return enum_value
         logger.warning("Invalid speed_vs_detail value %r. Falling back to legacy flags.", speed_vs_detail_value)
 
     fast = isinstance(parameters, dict) and "fast" in parameters
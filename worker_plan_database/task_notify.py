@@ -0,0 +1,140 @@
+"""
+Wake up the worker when a TaskItem becomes pending, instead of polling the database on a fixed interval.
+
+A trigger on task_item calls pg_notify() whenever a row is inserted or its state changes to pending.
+The worker LISTENs on that channel with a dedicated connection and blocks in select() until a
+notification arrives or the timeout expires. The timeout acts as a safety net, so a missed
+notification (e.g. while the listener was reconnecting) only delays pickup until the next timeout.
+
+On databases other than Postgres there is no LISTEN/NOTIFY, and the listener falls back to sleeping.
+"""
+import logging
+import select
+import time
+from typing import Any, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+TASK_PENDING_CHANNEL = "task_item_pending"
+
+_CREATE_NOTIFY_FUNCTION_SQL = f"""
+CREATE OR REPLACE FUNCTION notify_task_item_pending() RETURNS trigger AS $$
+BEGIN
+    IF NEW.state = 'pending' THEN
+        PERFORM pg_notify('{TASK_PENDING_CHANNEL}', NEW.id::text);
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+_DROP_NOTIFY_TRIGGER_SQL = "DROP TRIGGER IF EXISTS task_item_pending_notify ON task_item"
+
+_CREATE_NOTIFY_TRIGGER_SQL = """
+CREATE TRIGGER task_item_pending_notify
+AFTER INSERT OR UPDATE OF state ON task_item
+FOR EACH ROW EXECUTE FUNCTION notify_task_item_pending()
+"""
+
+
+def ensure_task_pending_notify_trigger(engine: Engine) -> None:
+    """Create (or replace) the trigger that notifies listeners about pending tasks. Postgres only."""
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as conn:
+        conn.execute(text(_CREATE_NOTIFY_FUNCTION_SQL))
+        conn.execute(text(_DROP_NOTIFY_TRIGGER_SQL))
+        conn.execute(text(_CREATE_NOTIFY_TRIGGER_SQL))
+
+
+class TaskPendingListener:
+    """
+    Blocks until a pending-task notification arrives, or the timeout expires.
+
+    Uses its own raw DBAPI connection from the engine pool, in autocommit mode, for the lifetime of the listener.
+    If the connection breaks, the listener falls back to sleeping for that wait and reconnects on the next one.
+    Notifications sent while reconnecting are lost, which is why the caller must also claim on timeout.
+    """
+    def __init__(self, engine: Engine, channel: str = TASK_PENDING_CHANNEL, fallback_poll_interval: float = 5.0):
+        self.engine = engine
+        self.channel = channel
+        self.fallback_poll_interval = fallback_poll_interval
+        self.enabled = engine.dialect.name == "postgresql"
+        self._raw_connection: Optional[Any] = None
+
+    def _connect(self) -> Any:
+        raw_connection = self.engine.raw_connection()
+        try:
+            dbapi_connection = raw_connection.driver_connection
+            dbapi_connection.autocommit = True
+            with dbapi_connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {self.channel}")
+        except Exception:
+            raw_connection.invalidate()
+            raise
+        logger.info("Listening for pending tasks on channel %r.", self.channel)
+        self._raw_connection = raw_connection
+        return dbapi_connection
+
+    def wait(self, timeout: float) -> bool:
+        """
+        Wait up to `timeout` seconds for a notification.
+        Without a working LISTEN connection, sleep at most `fallback_poll_interval` seconds instead.
+
+        Returns True if at least one notification was received. All queued notifications are drained,
+        so a burst of inserts results in a single wakeup; the caller is expected to keep claiming until the queue is empty.
+        """
+        if not self.enabled:
+            time.sleep(min(timeout, self.fallback_poll_interval))
+            return False
+
+        try:
+            if self._raw_connection is None:
+                dbapi_connection = self._connect()
+            else:
+                dbapi_connection = self._raw_connection.driver_connection
+
+            if hasattr(dbapi_connection, "poll"):
+                return self._wait_psycopg2(dbapi_connection, timeout)
+            return self._wait_psycopg3(dbapi_connection, timeout)
+        except Exception as exc:
+            logger.warning("LISTEN %s failed, falling back to sleeping: %s", self.channel, exc, exc_info=True)
+            self.close()
+            time.sleep(min(timeout, self.fallback_poll_interval))
+            return False
+
+    @staticmethod
+    def _wait_psycopg2(dbapi_connection: Any, timeout: float) -> bool:
+        if not dbapi_connection.notifies:
+            readable, _, _ = select.select([dbapi_connection], [], [], timeout)
+            if not readable:
+                return False
+            dbapi_connection.poll()
+        notified = bool(dbapi_connection.notifies)
+        dbapi_connection.notifies.clear()
+        return notified
+
+    @staticmethod
+    def _wait_psycopg3(dbapi_connection: Any, timeout: float) -> bool:
+        notified = False
+        for _ in dbapi_connection.notifies(timeout=timeout, stop_after=1):
+            notified = True
+        if notified:
+            # Drain whatever else has already arrived, without blocking.
+            for _ in dbapi_connection.notifies(timeout=0):
+                pass
+        return notified
+
+    def close(self) -> None:
+        """Discard the listening connection. It's in autocommit mode, so it must not go back into the pool."""
+        raw_connection = self._raw_connection
+        self._raw_connection = None
+        if raw_connection is None:
+            return
+        try:
+            raw_connection.invalidate()
+        except Exception as exc:
+            logger.debug("Error closing task listener connection: %s", exc)
@@ -0,0 +1,52 @@
+import io
+import unittest
+import zipfile
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+from worker_plan_database.run_zip import create_zip_bytes
+
+
+class TestCreateZipBytes(unittest.TestCase):
+    def test_zip_contains_run_files_except_log(self):
+        with TemporaryDirectory() as temp_dir:
+            run_dir = Path(temp_dir)
+            (run_dir / "001-start_time.json").write_text("{}", encoding="utf-8")
+            (run_dir / "log.txt").write_text("log", encoding="utf-8")
+            (run_dir / "sub").mkdir()
+            (run_dir / "sub" / "data.csv").write_text("a,b\n1,2\n", encoding="utf-8")
+            (run_dir / "sub" / "deeper").mkdir()
+            (run_dir / "sub" / "deeper" / "log.txt").write_text("log", encoding="utf-8")
+            (run_dir / "sub" / "deeper" / "x.json").write_text("[]", encoding="utf-8")
+
+            zip_bytes, file_count = create_zip_bytes(run_dir)
+
+            self.assertIsInstance(zip_bytes, bytes)
+            # Only the files directly in run_dir are counted, log.txt included.
+            self.assertEqual(file_count, 2)
+            with zipfile.ZipFile(io.BytesIO(zip_bytes)) as zipf:
+                self.assertEqual(sorted(zipf.namelist()), ["001-start_time.json", "sub/data.csv", "sub/deeper/x.json"])
+                self.assertEqual(zipf.read("sub/data.csv"), b"a,b\n1,2\n")
+
+    def test_large_files_are_streamed_and_small_files_keep_their_mode(self):
+        with TemporaryDirectory() as temp_dir:
+            run_dir = Path(temp_dir)
+            (run_dir / "small.json").write_bytes(b"{}")
+            (run_dir / "small.json").chmod(0o640)
+            (run_dir / "large.md").write_bytes(b"x" * 100)
+
+            with patch("worker_plan_database.run_zip.ZIP_WRITESTR_MAX_BYTES", 10):
+                zip_bytes, file_count = create_zip_bytes(run_dir)
+
+            self.assertEqual(file_count, 2)
+            with zipfile.ZipFile(io.BytesIO(zip_bytes)) as zipf:
+                self.assertIsNone(zipf.testzip())
+                self.assertEqual(zipf.read("large.md"), b"x" * 100)
+                small_info = zipf.getinfo("small.json")
+                self.assertEqual(small_info.compress_type, zipfile.ZIP_DEFLATED)
+                self.assertEqual((small_info.external_attr >> 16) & 0o777, 0o640)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+import time
+import unittest
+
+from sqlalchemy import create_engine
+
+from worker_plan_database.task_notify import TaskPendingListener, ensure_task_pending_notify_trigger
+
+
+class TestTaskPendingListener(unittest.TestCase):
+    def test_non_postgres_falls_back_to_sleeping(self):
+        engine = create_engine("sqlite://")
+        listener = TaskPendingListener(engine, fallback_poll_interval=0.01)
+        self.assertFalse(listener.enabled)
+        start = time.monotonic()
+        self.assertFalse(listener.wait(timeout=30))
+        self.assertLess(time.monotonic() - start, 5)
+        listener.close()
+
+    def test_ensure_trigger_is_noop_for_non_postgres(self):
+        engine = create_engine("sqlite://")
+        ensure_task_pending_notify_trigger(engine)
+
+    def test_wait_psycopg3_drains_notifications(self):
+        class FakePsycopg3Connection:
+            def __init__(self, pending: int):
+                self.pending = pending
+
+            def notifies(self, timeout=None, stop_after=None):
+                while self.pending > 0:
+                    self.pending -= 1
+                    yield object()
+                    if stop_after is not None:
+                        stop_after -= 1
+                        if stop_after == 0:
+                            return
+
+        connection = FakePsycopg3Connection(pending=3)
+        self.assertTrue(TaskPendingListener._wait_psycopg3(connection, timeout=0))
+        self.assertEqual(connection.pending, 0)
+        self.assertFalse(TaskPendingListener._wait_psycopg3(connection, timeout=0))
+
+
+if __name__ == "__main__":
+    unittest.main()